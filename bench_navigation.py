@@ -0,0 +1,192 @@
+"""Micro-benchmarks of the slide tools on the headless viewer.
+
+Generates PPTX and PDF decks of several sizes, drives them through the tools
+in ``tools.py`` with :class:`viewer.HeadlessPresentationViewer` and reports
+latency per operation. Results are saved as JSON so runs of different
+versions can be compared::
+
+    python bench_navigation.py                      # saves bench_results/<git rev>.json
+    python bench_navigation.py --compare bench_results/abc123.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import slide_cache
+import tools
+from command_queue import viewer_queue
+from viewer import HeadlessPresentationViewer
+
+RESULTS_DIR = Path("bench_results")
+DECK_SIZES = (10, 50, 150)
+REPEATS = 20
+
+
+def _slide_lines(num: int) -> list[str]:
+    return [f"Slide {num} title", f"Revenue grew by {num % 7 + 1} percent", "Lorem ipsum dolor sit amet " * 3]
+
+
+def write_pptx(path: Path, slides: int) -> None:
+    from pptx import Presentation
+
+    prs = Presentation()
+    for i in range(1, slides + 1):
+        title, *body = _slide_lines(i)
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = title
+        slide.placeholders[1].text = "\n".join(body)
+    prs.save(str(path))
+
+
+def write_pdf(path: Path, pages: int) -> None:
+    """Write a minimal PDF with one line of Helvetica text per slide line."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for i in range(1, pages + 1):
+        lines = [f"({line}) Tj 0 -24 Td" for line in _slide_lines(i)]
+        stream = ("BT /F1 18 Tf 40 500 Td " + " ".join(lines) + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 720 540] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    if isinstance(result, dict) and result.get("status") != "ok":
+        raise RuntimeError(f"{fn}: {result}")
+    return elapsed
+
+
+def _summary(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+    }
+
+
+def bench_deck(name: str, slides: int, repeats: int, rng: random.Random) -> dict:
+    results: dict[str, list[float]] = {}
+
+    def record(op: str, elapsed: float) -> None:
+        results.setdefault(op, []).append(elapsed)
+
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # every repeat starts from an empty slide text cache
+            slide_cache.CACHE_DIR = Path(cache_dir)
+            record("open", _timed(tools.open_presentation_tool.invoke, {"presentation_name": name}))
+            record("list_cold", _timed(tools.list_slides_tool.invoke, {}))
+            record("list_warm", _timed(tools.list_slides_tool.invoke, {}))
+            record("search", _timed(tools.search_slides_tool.invoke, {"query": f"revenue slide {rng.randint(1, slides)}"}))
+
+            for _ in range(5):
+                target = rng.randint(1, slides)
+                record("goto", _timed(tools.open_slide.invoke, {"slide_number": target}))
+
+            tools.open_slide.invoke({"slide_number": 1})
+            for _ in range(min(5, slides - 1)):
+                record("next", _timed(tools.next_slide.invoke, {}))
+            for _ in range(min(5, slides - 1)):
+                record("previous", _timed(tools.previous_slide.invoke, {}))
+
+            viewer = tools.get_slide_context().presentation.viewer
+            assert isinstance(viewer, HeadlessPresentationViewer)
+            viewer_queue.call(viewer.flush)
+            record("keys", float(len(viewer.events)))
+
+    keys = results.pop("keys")
+    summary = {op: _summary(samples) for op, samples in results.items()}
+    summary["keys_per_repeat"] = statistics.fmean(keys)
+    return summary
+
+
+def run(sizes, repeats: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    report = {}
+    with tempfile.TemporaryDirectory() as deck_dir:
+        tools.PRESENTATIONS_DIR = deck_dir
+        tools.OS_TYPE = "headless"
+        for size in sizes:
+            for ext, writer in ((".pptx", write_pptx), (".pdf", write_pdf)):
+                name = f"deck_{size}{ext}"
+                writer(Path(deck_dir) / name, size)
+                report[name] = bench_deck(name, size, repeats, rng)
+                print(f"{name}: " + ", ".join(
+                    f"{op} {stats['p50_ms']:.2f}ms" for op, stats in report[name].items() if isinstance(stats, dict)
+                ))
+        tools.get_slide_context().close()
+    return report
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"{'deck':<16} {'op':<10} {'base p50':>10} {'new p50':>10} {'ratio':>7}")
+    for deck, ops in current.items():
+        for op, stats in ops.items():
+            base = baseline.get(deck, {}).get(op)
+            if not isinstance(stats, dict) or not isinstance(base, dict):
+                continue
+            ratio = stats["p50_ms"] / base["p50_ms"] if base["p50_ms"] else float("inf")
+            print(f"{deck:<16} {op:<10} {base['p50_ms']:>10.2f} {stats['p50_ms']:>10.2f} {ratio:>7.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DECK_SIZES))
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default=None, help="name of the result file, git revision by default")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    label = args.label or _git_revision()
+    report = {"label": label, "decks": run(args.sizes, args.repeats, args.seed)}
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = RESULTS_DIR / f"{label}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Saved {out}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        compare(report["decks"], baseline["decks"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Recall versus latency of the FAISS index types supported by ``rag_module``.
+
+Every index type is built over the same vectors and swept over its search
+parameter. Recall@k is measured against the exact flat index, latency is per
+single query as in ``SimpleSearch.search``. Vectors come from an index
+directory built by ``rag_index.py`` or are generated::
+
+    python bench_rag.py --index-dir .rag_index
+    python bench_rag.py --synthetic 50000 --dim 1024
+    python bench_rag.py --index-dir .rag_index --encoders   # fp32 vs int8 encoder
+
+Results are saved to ``bench_results/rag-<label>.json``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from bench_navigation import RESULTS_DIR, _git_revision
+from rag_module import DEFAULT_ENCODER, build_search_index, load_encoder, encode_texts, set_search_params
+
+SWEEPS = {
+    "flat": [None],
+    "hnsw": [16, 32, 64, 128],
+    "ivf": [1, 4, 8, 16, 32],
+    "pq": [None],
+    "ivfpq": [1, 4, 8, 16, 32],
+}
+
+
+def load_vectors(index_dir: Path) -> tuple[np.ndarray, np.ndarray]:
+    from rag_index import IncrementalIndex
+
+    index = IncrementalIndex(index_dir)
+    if index.index is None or index.index.ntotal == 0:
+        raise SystemExit(f"No vectors in {index_dir}, run rag_index.py first")
+    return index.vectors()
+
+
+def synthetic_vectors(n: int, dim: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), dim)).astype("float32")
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors, np.arange(n, dtype="int64")
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """Perturbed copies of stored vectors standing in for user queries."""
+    rng = np.random.default_rng(seed + 1)
+    picked = vectors[rng.integers(len(vectors), size=count)]
+    queries = picked + 0.1 * rng.standard_normal(picked.shape).astype("float32")
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def _latency(index, queries: np.ndarray, k: int) -> tuple[np.ndarray, list[float]]:
+    found, samples = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        samples.append(time.perf_counter() - start)
+        found.append(ids[0])
+    return np.stack(found), samples
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def bench_indexes(vectors: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int, types) -> list[dict]:
+    exact = build_search_index(vectors, ids, "flat")
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for index_type in types:
+        start = time.perf_counter()
+        index = build_search_index(vectors, ids, index_type)
+        build_s = time.perf_counter() - start
+        for param in SWEEPS[index_type]:
+            if param is not None:
+                set_search_params(index, nprobe=param, ef_search=param)
+            found, samples = _latency(index, queries, k)
+            rows.append({
+                "index": index_type,
+                "param": param,
+                "recall": recall(found, truth),
+                "mean_ms": statistics.fmean(samples) * 1000,
+                "p95_ms": sorted(samples)[int(len(samples) * 0.95)] * 1000,
+                "build_s": build_s,
+            })
+            row = rows[-1]
+            print(f"{index_type:<6} {str(param):>5}  recall@{k} {row['recall']:.3f}  "
+                  f"{row['mean_ms']:.3f}ms (p95 {row['p95_ms']:.3f}ms)")
+    return rows
+
+
+def bench_encoders(encoder_path: str, texts: list[str], repeats: int) -> dict:
+    """Per-query latency of the fp32 and int8 encoder and agreement of their vectors."""
+    results, embeddings = {}, {}
+    for name, quantize in (("fp32", False), ("int8", True)):
+        tokenizer, model = load_encoder(encoder_path, "cpu", quantize=quantize)
+        encode_texts(model, tokenizer, texts[:1], "cpu")
+        samples = []
+        for _ in range(repeats):
+            for text in texts:
+                start = time.perf_counter()
+                encode_texts(model, tokenizer, [text], "cpu")
+                samples.append(time.perf_counter() - start)
+        embeddings[name] = encode_texts(model, tokenizer, texts, "cpu")
+        faiss.normalize_L2(embeddings[name])
+        results[name] = {"mean_ms": statistics.fmean(samples) * 1000}
+        print(f"encoder {name}: {results[name]['mean_ms']:.1f}ms per query")
+    results["cosine_fp32_int8"] = float(np.mean(np.sum(embeddings["fp32"] * embeddings["int8"], axis=1)))
+    print(f"mean cosine fp32/int8: {results['cosine_fp32_int8']:.4f}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index-dir", type=Path, default=None, help="directory built by rag_index.py")
+    parser.add_argument("--synthetic", type=int, default=20000, help="number of generated vectors")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--types", nargs="+", default=list(SWEEPS), choices=list(SWEEPS))
+    parser.add_argument("--encoders", action="store_true", help="also compare fp32 and int8 encoders")
+    parser.add_argument("--encoder", default=DEFAULT_ENCODER)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default=None, help="name of the result file, git revision by default")
+    args = parser.parse_args()
+
+    if args.index_dir:
+        vectors, ids = load_vectors(args.index_dir)
+    else:
+        vectors, ids = synthetic_vectors(args.synthetic, args.dim, args.seed)
+    print(f"{len(vectors)} vectors of dim {vectors.shape[1]}, {args.queries} queries")
+
+    report = {
+        "label": args.label or _git_revision(),
+        "vectors": len(vectors),
+        "dim": int(vectors.shape[1]),
+        "k": args.k,
+        "indexes": bench_indexes(vectors, ids, make_queries(vectors, args.queries, args.seed), args.k, args.types),
+    }
+    if args.encoders:
+        texts = ["Какая выручка была в прошлом квартале?", "Покажи слайд про архитектуру",
+                 "What are the main risks of the project?", "Сроки запуска и бюджет"]
+        report["encoders"] = bench_encoders(args.encoder, texts, repeats=5)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = RESULTS_DIR / f"rag-{report['label']}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Saved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Cold start time and memory of the entry-point modules.
+
+Each module is imported in a fresh interpreter, repeatedly, and the import
+time, peak RSS and which heavy optional libraries got loaded are reported.
+Results are saved as JSON like ``bench_navigation.py``::
+
+    python bench_startup.py                         # saves bench_results/startup-<git rev>.json
+    python bench_startup.py --compare bench_results/startup-abc123.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from bench_navigation import RESULTS_DIR, _git_revision, _summary
+
+MODULES = ("graph", "main", "service", "tools", "rag_module")
+REPEATS = 5
+# Libraries that should only be loaded when actually used
+HEAVY_MODULES = ("torch", "faiss", "transformers", "pptx", "PyPDF2", "pyautogui", "langchain_gigachat")
+
+_CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+rss_mb = rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"import_s": elapsed, "rss_mb": rss_mb, "heavy": heavy}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """Import ``module`` in a new interpreter and return its measurements."""
+    code = _CHILD.format(module=module, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    wall = time.perf_counter() - start
+    # modules may print on import, the measurement is the last line
+    result = json.loads(out.strip().splitlines()[-1])
+    result["wall_s"] = wall
+    return result
+
+
+def run(modules, repeats: int) -> dict:
+    report = {}
+    for module in modules:
+        runs = [measure(module) for _ in range(repeats)]
+        report[module] = {
+            "import": _summary([r["import_s"] for r in runs]),
+            "wall": _summary([r["wall_s"] for r in runs]),
+            "rss_mb": max(r["rss_mb"] for r in runs),
+            "heavy": runs[-1]["heavy"],
+        }
+        stats = report[module]
+        print(f"{module}: import {stats['import']['p50_ms']:.0f}ms, process {stats['wall']['p50_ms']:.0f}ms, "
+              f"RSS {stats['rss_mb']:.0f}MB, heavy: {', '.join(stats['heavy']) or '-'}")
+    return report
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"{'module':<12} {'base ms':>9} {'new ms':>9} {'base MB':>9} {'new MB':>9}")
+    for module, stats in current.items():
+        base = baseline.get(module)
+        if base is None:
+            continue
+        print(f"{module:<12} {base['import']['p50_ms']:>9.0f} {stats['import']['p50_ms']:>9.0f} "
+              f"{base['rss_mb']:>9.0f} {stats['rss_mb']:>9.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--label", default=None, help="name of the result file, git revision by default")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    label = args.label or _git_revision()
+    report = {"label": label, "modules": run(args.modules, args.repeats)}
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = RESULTS_DIR / f"startup-{label}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Saved {out}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        compare(report["modules"], baseline["modules"])
+
+
+if __name__ == "__main__":
+    main()
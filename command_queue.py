@@ -0,0 +1,160 @@
+"""Single-writer, prioritized queue of commands sent to the presentation viewer.
+
+All viewer-changing tools run one at a time on one worker thread, so key
+presses of different callers never interleave. Waiting commands are taken
+in priority order: manual controls (``MANUAL``) go before the tool calls of
+agent runs (``AGENT``), so a presenter does not wait behind the LLM loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+MANUAL = 0
+AGENT = 1
+PRIORITY_NAMES = {MANUAL: "manual", AGENT: "agent"}
+
+# Priority of commands issued from the current task or thread
+command_priority: contextvars.ContextVar[int] = contextvars.ContextVar("command_priority", default=AGENT)
+
+# Wait times kept per priority for the percentiles in stats()
+_WAIT_SAMPLES = 1000
+
+
+class CommandQueue:
+    """Priority queue served by one daemon worker thread started on first use.
+
+    Commands run in a copy of the submitter's context, so tools see the
+    slide context of the session that issued them.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[int, int, float, Future, contextvars.Context, object, tuple, dict]] = []
+        # commands of submit_later() keyed by the time they become due
+        self._delayed: list[tuple[float, int, int, Future, contextvars.Context, object, tuple, dict]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._waits = {p: deque(maxlen=_WAIT_SAMPLES) for p in PRIORITY_NAMES}
+        self._executed = {p: 0 for p in PRIORITY_NAMES}
+        self._max_depth = 0
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name="viewer-commands", daemon=True)
+            self._thread.start()
+
+    def submit(self, fn, *args, priority: int | None = None, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)`` and return a future of its result."""
+        if priority is None:
+            priority = command_priority.get()
+        future: Future = Future()
+        context = contextvars.copy_context()
+        with self._cond:
+            self._ensure_worker()
+            heapq.heappush(
+                self._heap,
+                (priority, next(self._seq), time.monotonic(), future, context, fn, args, kwargs),
+            )
+            self._max_depth = max(self._max_depth, len(self._heap))
+            self._cond.notify()
+        return future
+
+    def submit_later(self, delay: float, fn, *args, priority: int | None = None, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)`` after ``delay`` seconds; cancel the future to drop it."""
+        if priority is None:
+            priority = command_priority.get()
+        future: Future = Future()
+        context = contextvars.copy_context()
+        with self._cond:
+            self._ensure_worker()
+            heapq.heappush(
+                self._delayed,
+                (time.monotonic() + delay, next(self._seq), priority, future, context, fn, args, kwargs),
+            )
+            self._cond.notify()
+        return future
+
+    def _release_due(self) -> float | None:
+        """Move due delayed commands to the queue; return seconds until the next one."""
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            due, _, priority, future, context, fn, args, kwargs = heapq.heappop(self._delayed)
+            heapq.heappush(self._heap, (priority, next(self._seq), due, future, context, fn, args, kwargs))
+        return self._delayed[0][0] - now if self._delayed else None
+
+    def call(self, fn, *args, priority: int | None = None, **kwargs):
+        """Run ``fn`` through the queue and wait for its result."""
+        if threading.current_thread() is self._thread:
+            # already on the worker, e.g. a queued tool invoking another tool
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, priority=priority, **kwargs).result()
+
+    async def asubmit(self, fn, *args, priority: int | None = None, **kwargs):
+        """Awaitable version of :meth:`call`."""
+        return await asyncio.wrap_future(self.submit(fn, *args, priority=priority, **kwargs))
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    timeout = self._release_due()
+                    if self._heap:
+                        break
+                    self._cond.wait(timeout)
+                priority, _, queued_at, future, context, fn, args, kwargs = heapq.heappop(self._heap)
+
+            # cancelled while waiting, e.g. the HTTP client went away
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._waits[priority].append(time.monotonic() - queued_at)
+            self._executed[priority] += 1
+            try:
+                future.set_result(context.run(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def depth(self) -> dict[str, int]:
+        with self._cond:
+            queued = [entry[0] for entry in self._heap]
+        return {name: queued.count(p) for p, name in PRIORITY_NAMES.items()}
+
+    def stats(self) -> dict:
+        """Queue depth and wait times in milliseconds per priority."""
+        waits = {}
+        for p, name in PRIORITY_NAMES.items():
+            samples = sorted(self._waits[p])
+            waits[name] = {
+                "executed": self._executed[p],
+                "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+                "p50_ms": samples[len(samples) // 2] * 1000 if samples else 0.0,
+                "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000 if samples else 0.0,
+                "max_ms": samples[-1] * 1000 if samples else 0.0,
+            }
+        return {"depth": self.depth(), "max_depth": self._max_depth, "wait": waits}
+
+
+viewer_queue = CommandQueue()
+
+
+def viewer_command(fn):
+    """Run the decorated function through :data:`viewer_queue`.
+
+    Place it under ``@tool`` so that the tool keeps its signature and
+    description. The priority comes from :data:`command_priority`.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return viewer_queue.call(fn, *args, **kwargs)
+
+    return wrapper
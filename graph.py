@@ -1,18 +1,42 @@
 """LangGraph workflow connecting reflection and tool-execution nodes."""
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from state import AgentState
-from nodes import reflect_node, use_tool_node, should_use_tool
+from metrics import node_seconds, timed
+from nodes import (
+    reflect_node,
+    areflect_node,
+    use_tool_node,
+    ause_tool_node,
+    route_node,
+    should_use_tool,
+    after_route,
+    after_tool,
+)
 
 workflow = StateGraph(AgentState)
 
-# Step 1: reflect (plan & choose action)
-workflow.add_node("reflect", reflect_node)
+# Step 0: handle plain navigation commands locally
+workflow.add_node("route", timed(node_seconds, node="route")(route_node))
+# Step 1: reflect (plan & choose action); the async variant serves astream
+workflow.add_node("reflect", RunnableLambda(
+    timed(node_seconds, node="reflect")(reflect_node),
+    afunc=timed(node_seconds, node="reflect")(areflect_node),
+))
 # Step 2: execute (call the chosen tool)
-workflow.add_node("use_tool", use_tool_node)
+workflow.add_node("use_tool", RunnableLambda(
+    timed(node_seconds, node="use_tool")(use_tool_node),
+    afunc=timed(node_seconds, node="use_tool")(ause_tool_node),
+))
 
-# Start by reflecting
-workflow.set_entry_point("reflect")
+# Start by trying the local router, falling back to reflection
+workflow.set_entry_point("route")
+workflow.add_conditional_edges(
+    "route",
+    after_route,
+    {"use_tool": "use_tool", "reflect": "reflect"},
+)
 
 # If reflect_node emits a tool_call → go execute; else finish
 workflow.add_conditional_edges(
@@ -21,8 +45,12 @@ workflow.add_conditional_edges(
     {"use_tool": "use_tool", "end": END},
 )
 
-# After executing, loop back to planning
-workflow.add_edge("use_tool", "reflect")
+# After executing, loop back to planning unless the command was routed locally
+workflow.add_conditional_edges(
+    "use_tool",
+    after_tool,
+    {"reflect": "reflect", "end": END},
+)
 
 # Compile for use
 graph = workflow.compile()
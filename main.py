@@ -3,9 +3,18 @@
 from langchain_core.messages import HumanMessage, AIMessage
 from colorama import init, Fore, Style, Back
 from graph import graph
+from config import config
+from memory import ConversationMemory
+from model import warm_up_in_background
+from nodes import slide_tools
+from traces import get_recorder
 
 if __name__ == '__main__':
-    conversation = {"messages": [], "current_slide": None, "current_presentation": None}
+    if config.get("model_warmup", True):
+        warm_up_in_background(slide_tools)
+    memory = ConversationMemory()
+    recorder = get_recorder()
+    conversation = {"current_slide": None, "current_presentation": None}
     print("Чем могу помочь?")
     while True:
         user_input = input("You: ")
@@ -15,26 +24,34 @@ if __name__ == '__main__':
 
         first_human_message = HumanMessage(content=user_input)
         # Add the user's message as a HumanMessage
-        conversation["messages"].append(first_human_message)
+        memory.add(first_human_message)
+        run_trace = recorder.start_run("cli", user_input, conversation) if recorder else None
 
         # Stream through the agent
-        stream = graph.stream(conversation, stream_mode="values")
+        stream = graph.stream(
+            {**conversation, "messages": memory.messages(), "summary": memory.summary},
+            stream_mode="values",
+        )
 
         # Collect assistant messages
         for step in stream:
             msg = step["messages"][-1]
             try:
                 # TODO: for first and last message. Maybe it shold made another way
-                if msg in conversation["messages"]:
+                if msg in memory:
                     continue
 
                 if isinstance(msg, AIMessage):
                     print(f"{Fore.YELLOW}{msg.content}{Style.RESET_ALL}")
                 else:
                     msg.pretty_print()
-                conversation["messages"].append(msg)
+                memory.add(msg)
+                if run_trace is not None:
+                    run_trace.step([msg])
                 if step.get("current_slide") is not None:
                     conversation["current_slide"] = step["current_slide"]
                 if step.get("current_presentation") is not None:
                     conversation["current_presentation"] = step["current_presentation"]
             except AttributeError:                print(msg)
+        if run_trace is not None:
+            run_trace.end()
@@ -0,0 +1,95 @@
+"""Bounded conversation history with a rolling summary of older messages."""
+
+from __future__ import annotations
+
+import uuid
+from collections import deque
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from config import config
+
+MAX_MESSAGES = config.get("memory_max_messages", 40)
+MAX_SUMMARY_LINES = config.get("memory_max_summary_lines", 20)
+# Longest user utterance kept verbatim in a summary line
+_UTTERANCE_CHARS = 120
+
+
+def _summarize(chunk: list[BaseMessage]) -> str | None:
+    """Turn a dropped message with its tool results into one summary line."""
+    head = chunk[0]
+    if isinstance(head, HumanMessage):
+        text = " ".join(str(head.content).split())
+        if len(text) > _UTTERANCE_CHARS:
+            text = text[:_UTTERANCE_CHARS] + "…"
+        return f"Пользователь: {text}"
+
+    if isinstance(head, AIMessage) and head.tool_calls:
+        calls = ", ".join(
+            f"{call['name']}({', '.join(f'{k}={v!r}' for k, v in call['args'].items())})"
+            for call in head.tool_calls
+        )
+        return f"Агент: {calls}"
+    return None
+
+
+class ConversationMemory:
+    """Message history capped at ``max_messages``.
+
+    Messages are deduplicated by ID. When the cap is exceeded the oldest
+    messages are dropped together with their tool results and folded into a
+    short textual summary, so both memory and per-turn work stay constant.
+    """
+
+    def __init__(self, max_messages: int = MAX_MESSAGES, max_summary_lines: int = MAX_SUMMARY_LINES) -> None:
+        self.max_messages = max_messages
+        self._messages: deque[BaseMessage] = deque()
+        self._ids: set[str] = set()
+        self._summary: deque[str] = deque(maxlen=max_summary_lines)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __contains__(self, message: BaseMessage) -> bool:
+        return message.id is not None and message.id in self._ids
+
+    def add(self, message: BaseMessage) -> bool:
+        """Append ``message`` unless it is already stored; return whether it was added."""
+        if message in self:
+            return False
+        if message.id is None:
+            message.id = str(uuid.uuid4())
+        self._messages.append(message)
+        self._ids.add(message.id)
+        self._fold()
+        return True
+
+    def truncate(self, message: BaseMessage) -> None:
+        """Forget ``message`` and every message added after it."""
+        if message not in self:
+            return
+        while self._messages:
+            dropped = self._messages.pop()
+            self._ids.discard(dropped.id)
+            if dropped.id == message.id:
+                break
+
+    def messages(self) -> list[BaseMessage]:
+        return list(self._messages)
+
+    @property
+    def summary(self) -> str | None:
+        return "\n".join(self._summary) if self._summary else None
+
+    def _fold(self) -> None:
+        while len(self._messages) > self.max_messages:
+            chunk = [self._messages.popleft()]
+            # tool results must not outlive the call that produced them
+            while self._messages and isinstance(self._messages[0], ToolMessage):
+                chunk.append(self._messages.popleft())
+
+            for message in chunk:
+                self._ids.discard(message.id)
+            line = _summarize(chunk)
+            if line:
+                self._summary.append(line)
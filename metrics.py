@@ -0,0 +1,181 @@
+"""In-process latency histograms and counters in the Prometheus text format.
+
+Metrics are module-level objects updated from the graph nodes, tools, viewer
+and presentations; ``service.py`` serves :func:`render` at ``/metrics``.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; covers key presses through multi-second LLM loops
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: list["_Metric"] = []
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " "))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return super().render() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: bucket counts (last one is +Inf), sum
+        self._series: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+        lines = super().render()
+        for key, (counts, total) in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="{}"'.format("+Inf" if bound == float("inf") else repr(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+agent_run_seconds = Histogram("agent_run_seconds", "Duration of a whole agent run for one command")
+manual_command_seconds = Histogram("manual_command_seconds", "Duration of manual slide commands including queueing", ("command",))
+node_seconds = Histogram("graph_node_seconds", "Duration of graph nodes", ("node",))
+model_call_seconds = Histogram("model_call_seconds", "Duration of single LLM invocation attempts", ("outcome",))
+model_retries = Counter("model_retries_total", "LLM invocations retried after a failure")
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by the LLM", ("kind",))
+tool_seconds = Histogram("tool_seconds", "Duration of tool calls; agent calls include viewer queueing", ("tool",))
+tool_errors = Counter("tool_errors_total", "Tool calls that failed or returned an error status", ("tool",))
+viewer_action_seconds = Histogram("viewer_action_seconds", "Duration of viewer actions", ("action",))
+viewer_key_wait_seconds = Histogram("viewer_key_wait_seconds", "Time slept between key presses")
+slide_extract_seconds = Histogram("slide_extract_seconds", "Duration of slide text extraction", ("format",))
+
+
+def record_usage(message) -> None:
+    """Count the tokens reported in an AI message's usage metadata."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    for kind in ("input_tokens", "output_tokens"):
+        if usage.get(kind):
+            llm_tokens.inc(usage[kind], kind=kind.split("_")[0])
+
+
+def timed(histogram: Histogram, **labels):
+    """Decorator observing the duration of sync and async functions."""
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def timed_tool(fn):
+    """Time a tool function and count its errors; place it under ``@tool``."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            tool_errors.inc(tool=fn.__name__)
+            raise
+        finally:
+            tool_seconds.observe(time.perf_counter() - start, tool=fn.__name__)
+        if isinstance(result, dict) and result.get("status") == "error":
+            tool_errors.inc(tool=fn.__name__)
+        return result
+
+    return wrapper
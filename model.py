@@ -1,21 +1,63 @@
-"""Helper to initialize the GigaChat model and bind tools."""
+"""Helper to initialize the GigaChat model and bind tools.
+
+A single ``GigaChat`` instance is shared by the whole process so that its
+HTTP connection pool and OAuth token are reused between calls. Tool bindings
+are cached per tool set on top of it.
+"""
+
+from __future__ import annotations
 
 import os
 import sys
+import threading
+import time
 from colorama import init, Fore, Style, Back
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from langchain_gigachat import GigaChat
+from typing import TYPE_CHECKING
+
+from config import config
+
+if TYPE_CHECKING:
+    from langchain_gigachat import GigaChat
 
 # Get API key from environment
 api_key = os.getenv("GIGACHAT_API_KEY")
 if not api_key:
     print(f"{Fore.RED}Error: GIGACHAT_API_KEY not found in environment variables{Style.RESET_ALL}")
 
-def get_model(tools_list):
-    model = GigaChat(
+# Seconds between background requests that keep the connection and token fresh
+KEEPALIVE_INTERVAL = config.get("model_keepalive_interval", 60)
+
+_lock = threading.Lock()
+_base_model: GigaChat | None = None
+_bound_models: dict[tuple[str, ...], object] = {}
+_keepalive_thread: threading.Thread | None = None
+# Stand-in returned instead of GigaChat, e.g. a recorded model in replay.py
+_model_override = None
+
+
+def set_model_override(model) -> None:
+    """Serve ``model`` instead of GigaChat; ``None`` restores the real client."""
+    global _model_override
+    with _lock:
+        _model_override = model
+        _bound_models.clear()
+
+
+def get_base_model() -> GigaChat:
+    """Return the process-wide GigaChat client, creating it on first use."""
+    global _base_model
+    if _model_override is not None:
+        return _model_override
+    with _lock:
+        if _base_model is None:
+            # the client library is loaded with the first model call or warm-up
+            from langchain_gigachat import GigaChat
+
+            _base_model = GigaChat(
                 credentials=api_key,
                 scope="GIGACHAT_API_CORP",
                 model="GigaChat-2-Max",
@@ -23,8 +65,63 @@ def get_model(tools_list):
                 verify_ssl_certs=False,
                 profanity_check=False
             )
+        return _base_model
+
+
+def get_model(tools_list):
+    model = get_base_model()
+    if not tools_list:
+        return model
+
+    key = tuple(tool.name for tool in tools_list)
+    with _lock:
+        bound = _bound_models.get(key)
+        if bound is None:
+            bound = _bound_models[key] = model.bind_tools(tools_list)
+    return bound
+
+
+def _ping() -> None:
+    # Any authorized request refreshes a token close to expiry and keeps the
+    # pooled TLS connection open
+    get_base_model().get_models()
+
+
+def _keepalive_loop(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            _ping()
+        except Exception as e:  # pragma: no cover - network errors
+            print(f"{Fore.RED}Model keep-alive failed: {e}{Style.RESET_ALL}", file=sys.stderr)
+
+
+def start_keepalive(interval: float = KEEPALIVE_INTERVAL) -> None:
+    """Refresh the access token and connection periodically in the background."""
+    global _keepalive_thread
+    if not interval or interval <= 0:
+        return
+    with _lock:
+        if _keepalive_thread is not None:
+            return
+        _keepalive_thread = threading.Thread(
+            target=_keepalive_loop, args=(interval,), name="model-keepalive", daemon=True
+        )
+        _keepalive_thread.start()
+
+
+def warm_up(tools_list=None) -> None:
+    """Authenticate, open the connection and bind tools before the first command."""
+    get_model(tools_list)
+    try:
+        _ping()
+    except Exception as e:  # pragma: no cover - network errors
+        print(f"{Fore.RED}Model warm-up failed: {e}{Style.RESET_ALL}", file=sys.stderr)
+    start_keepalive()
+
 
-    if tools_list:
-        model = model.bind_tools(tools_list)
-    
-    return model
\ No newline at end of file
+def warm_up_in_background(tools_list=None) -> threading.Thread:
+    """Run :func:`warm_up` without blocking startup."""
+    thread = threading.Thread(target=warm_up, args=(tools_list,), name="model-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,8 +1,11 @@
 """Graph nodes that plan actions and execute slide-control tools."""
 
+import asyncio
 import json
-import time
-from langchain_core.messages import SystemMessage, HumanMessage, trim_messages
+import sys
+import uuid
+from colorama import Fore, Style
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage, ToolMessage, trim_messages
 from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import ToolNode
 from state import AgentState
@@ -14,8 +17,16 @@ from tools import (
     previous_slide,
     list_presentations_tool,
     list_slides_tool,
+    search_slides_tool,
 )
+from tool_batches import expand_result, jump, plan_batches
+from command_queue import viewer_queue
 from prompts import create_system_prompt
+from router import route_clauses, route_command
+from token_counter import get_token_counter
+from metrics import record_usage
+from plan_cache import PLAN_CACHE_ENABLED, plan_cache
+from resilience import MODEL_MAX_ATTEMPTS, ModelUnavailable, ainvoke_model, deadline_from_now, invoke_model
 
 # Shared list of slide-control tools
 slide_tools = [
@@ -25,52 +36,124 @@ slide_tools = [
     previous_slide,
     list_presentations_tool,
     list_slides_tool,
+    search_slides_tool,
 ]
 
 # Prebuilt node for executing tools
 tool_node = ToolNode(slide_tools)
 
-def reflect_node(state: AgentState, config: RunnableConfig, max_attempts = 5):
-    """1) Reflect, plan & choose one tool call."""
+# Name of AI messages issued by route_node instead of the model
+ROUTER_NAME = "router"
+# Name of AI messages replaying a plan from the plan cache
+PLAN_CACHE_NAME = "plan_cache"
+LOCAL_PLANNERS = {ROUTER_NAME, PLAN_CACHE_NAME}
+
+MODEL_UNAVAILABLE_MESSAGE = (
+    "Модель сейчас недоступна. Простые команды вроде «следующий слайд» или «слайд 5» продолжают работать."
+)
+
+def _local_plan(name: str, calls: list[dict]) -> AIMessage:
+    tool_calls = [
+        {"name": call["name"], "args": call["args"], "id": f"{name}-{uuid.uuid4().hex}", "type": "tool_call"}
+        for call in calls
+    ]
+    return AIMessage(content="", name=name, tool_calls=tool_calls)
+
+def route_node(state: AgentState):
+    """0) Handle unambiguous and previously planned commands without calling the model."""
+    last = state["messages"][-1]
+    if not isinstance(last, HumanMessage):
+        return {}
+
+    presentation, slide = state.get("current_presentation"), state.get("current_slide")
+    update = {"turn_start": {"presentation": presentation, "slide": slide, "deadline": deadline_from_now()}}
+
+    command = route_command(last.content, slide) if presentation else None
+    if command is not None:
+        update["messages"] = [_local_plan(ROUTER_NAME, [command])]
+    elif PLAN_CACHE_ENABLED:
+        calls = plan_cache.lookup(last.content, presentation, slide)
+        if calls:
+            update["messages"] = [_local_plan(PLAN_CACHE_NAME, calls)]
+    return update
+
+def _remember_plan(state: AgentState, response) -> None:
+    """Cache the navigation the model chose once it finishes the turn."""
+    start = state.get("turn_start")
+    if PLAN_CACHE_ENABLED and start is not None and not response.tool_calls:
+        plan_cache.record(list(state["messages"]) + [response], start["presentation"], start["slide"])
 
+def _build_conversation(state: AgentState, model):
     system = SystemMessage(
         create_system_prompt()
         + get_presentation_info(state)
+        + get_summary_info(state)
     )
 
-    model = get_model(slide_tools)
-
     # Trim conversation to avoid exceeding the model context window
     conversation = [system] + list(state["messages"])
-    conversation = trim_messages(
+    return trim_messages(
         conversation,
-        token_counter=model,
+        token_counter=get_token_counter(model),
         max_tokens=1000,
         strategy="last",
         include_system=True,
     )
 
-    # retry invoking the model in case of transient failures
-    for attempt in range(1, max_attempts + 1):
-        try:
-            response = model.invoke(conversation, config)
-            break
-        except Exception:
-            if attempt == max_attempts:
-                raise
-            coef = 0.2
-            time.sleep(coef * (2 ** (attempt - 1)))
+def _bound_tools(state: AgentState):
+    """Tools offered to the model; searching is dropped once the budget is spent."""
+    if get_searches_left(state) > 0:
+        return slide_tools
+    return [t for t in slide_tools if t is not search_slides_tool]
+
+def _deadline(state: AgentState) -> float:
+    start = state.get("turn_start") or {}
+    return start.get("deadline") or deadline_from_now()
+
+def _fallback_response(state: AgentState, error: ModelUnavailable) -> AIMessage:
+    """Plan without the model: route the command clause of the utterance or report the outage."""
+    print(f"{Fore.RED}Model unavailable: {error}{Style.RESET_ALL}", file=sys.stderr)
+    last = state["messages"][-1]
+    if isinstance(last, HumanMessage) and state.get("current_presentation"):
+        command = route_clauses(last.content, state.get("current_slide"))
+        if command is not None:
+            return _local_plan(ROUTER_NAME, [command])
+    return AIMessage(content=MODEL_UNAVAILABLE_MESSAGE)
+
+def reflect_node(state: AgentState, config: RunnableConfig, max_attempts = MODEL_MAX_ATTEMPTS):
+    """1) Reflect, plan & choose one tool call."""
+
+    model = get_model(_bound_tools(state))
+    conversation = _build_conversation(state, model)
 
+    # retries, timeouts and hedging within the run's budget
+    try:
+        response = invoke_model(model, conversation, config, _deadline(state), max_attempts)
+    except ModelUnavailable as e:
+        return {"messages": [_fallback_response(state, e)]}
+
+    record_usage(response)
+    _remember_plan(state, response)
     return {"messages": [response]}
 
-def use_tool_node(state: AgentState, config: RunnableConfig):
-    """2) Execute the tool call chosen in reflect_node using ToolNode."""
-    # Run tools with the prebuilt ToolNode
-    result = tool_node.invoke(state, config)
+async def areflect_node(state: AgentState, config: RunnableConfig, max_attempts = MODEL_MAX_ATTEMPTS):
+    """Async version of :func:`reflect_node`."""
+
+    model = get_model(_bound_tools(state))
+    conversation = _build_conversation(state, model)
 
+    try:
+        response = await ainvoke_model(model, conversation, config, _deadline(state), max_attempts)
+    except ModelUnavailable as e:
+        return {"messages": [_fallback_response(state, e)]}
+
+    record_usage(response)
+    _remember_plan(state, response)
+    return {"messages": [response]}
+
+def _track_tool_results(state: AgentState, outputs):
     current_slide = state.get("current_slide")
     current_presentation = state.get("current_presentation")
-    outputs = result["messages"]
 
     # Inspect tool results to track the current slide and presentation
     for message in outputs:
@@ -96,16 +179,91 @@ def use_tool_node(state: AgentState, config: RunnableConfig):
         "current_presentation": current_presentation,
     }
 
+def _tool_messages(calls) -> dict:
+    return {"messages": [AIMessage(content="", tool_calls=calls)]}
+
+def _split_batch(batch):
+    """Calls to run through ToolNode and the navigation calls to coalesce."""
+    if len(batch.navigation) < 2:
+        return batch.calls + batch.navigation, []
+    return batch.calls, batch.navigation
+
+def use_tool_node(state: AgentState, config: RunnableConfig):
+    """2) Execute the tool calls chosen in reflect_node batch by batch using ToolNode."""
+    tool_calls = state["messages"][-1].tool_calls
+    results = {}
+    for batch in plan_batches(tool_calls):
+        calls, navigation = _split_batch(batch)
+        # the jump runs on the viewer worker while the other calls execute
+        jumping = viewer_queue.submit(jump, navigation) if navigation else None
+        outputs = tool_node.invoke(_tool_messages(calls), config)["messages"] if calls else []
+        jumped = jumping.result() if jumping is not None else None
+        if jumped is not None:
+            outputs += expand_result(navigation, *jumped)
+        elif navigation:
+            # a step leaves the deck: run the calls one by one for exact errors
+            for call in navigation:
+                outputs += tool_node.invoke(_tool_messages([call]), config)["messages"]
+        results.update((message.tool_call_id, message) for message in outputs)
+    return _track_tool_results(state, [results[call["id"]] for call in tool_calls])
+
+async def ause_tool_node(state: AgentState, config: RunnableConfig):
+    """Async version of :func:`use_tool_node`."""
+    tool_calls = state["messages"][-1].tool_calls
+    results = {}
+    for batch in plan_batches(tool_calls):
+        calls, navigation = _split_batch(batch)
+        jumping = asyncio.wrap_future(viewer_queue.submit(jump, navigation)) if navigation else None
+        outputs = (await tool_node.ainvoke(_tool_messages(calls), config))["messages"] if calls else []
+        jumped = await jumping if jumping is not None else None
+        if jumped is not None:
+            # texts of the intermediate slides may need extracting
+            outputs += await asyncio.to_thread(expand_result, navigation, *jumped)
+        elif navigation:
+            for call in navigation:
+                outputs += (await tool_node.ainvoke(_tool_messages([call]), config))["messages"]
+        results.update((message.tool_call_id, message) for message in outputs)
+    return _track_tool_results(state, [results[call["id"]] for call in tool_calls])
+
 def should_use_tool(state: AgentState):
     """If the last LLM output included a tool call, go to execute; otherwise end."""
     last = state["messages"][-1]
     return "use_tool" if last.tool_calls else "end"
 
+def after_route(state: AgentState):
+    """Execute a locally planned command or fall back to the model."""
+    last = state["messages"][-1]
+    return "use_tool" if isinstance(last, AIMessage) and last.name in LOCAL_PLANNERS else "reflect"
+
+def _tool_failed(message: ToolMessage) -> bool:
+    try:
+        return json.loads(message.content).get("status") != "ok"
+    except (json.JSONDecodeError, AttributeError):
+        return True
+
+def after_tool(state: AgentState):
+    """Finish locally planned commands; let the model review other tool results.
+
+    A cached plan that no longer works is forgotten and handed to the model.
+    """
+    results = []
+    for message in reversed(state["messages"]):
+        if isinstance(message, ToolMessage):
+            results.append(message)
+        elif isinstance(message, AIMessage):
+            if message.name == PLAN_CACHE_NAME and any(_tool_failed(m) for m in results):
+                start = state.get("turn_start") or {}
+                human = next(m for m in reversed(state["messages"]) if isinstance(m, HumanMessage))
+                plan_cache.discard(human.content, start.get("presentation"), start.get("slide"))
+                return "reflect"
+            return "end" if message.name in LOCAL_PLANNERS else "reflect"
+    return "reflect"
+
 def get_searches_left(state: AgentState, max_searches: int = 5):
     searches = 0
 
     for m in reversed(state["messages"]):
-        if m.name == 'search_rag':
+        if m.name == search_slides_tool.name:
             searches += 1
         # counting down searches to the last human message
         elif isinstance(m, HumanMessage):
@@ -118,3 +276,8 @@ def get_presentation_info(state: AgentState):
     current_slide = state['current_slide'] if state.get('current_slide') else "Нет"
 
     return f"\n\nТекущая презентация: {current_presentation}\nТекущий слайд: {current_slide}"
+
+def get_summary_info(state: AgentState):
+    if not state.get('summary'):
+        return ""
+    return f"\n\nРанее в разговоре:\n{state['summary']}"
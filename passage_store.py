@@ -0,0 +1,109 @@
+"""Compact memory-mapped store of search passages.
+
+Replaces the JSON ``texts_dict`` of ``SimpleSearch``. The whole store is one
+file: a header, sorted passage IDs, an offsets array and a UTF-8 blob. The
+passage prefix is stripped and the neighbour context is joined when the
+file is built, so a lookup is a binary search and a slice of the shared,
+read-only mapping.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import struct
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"PSTORE1\0"
+_HEADER = struct.Struct("<8sQ")
+_PREFIX_RE = re.compile(r"^\s*passage:?\s*")
+
+
+def store_path(texts_dict_path: str | os.PathLike) -> Path:
+    """Return the passage store that corresponds to a JSON texts dict."""
+    return Path(texts_dict_path).with_suffix(".passages")
+
+
+def _strip_prefix(text: str) -> str:
+    return _PREFIX_RE.sub("", text, count=1).strip()
+
+
+def build_passage_store(texts: dict[str, str], path: str | os.PathLike) -> Path:
+    """Write ``texts`` (``{"<id>": "passage: ..."}``) to a store file at ``path``."""
+    path = Path(path)
+    plain = {int(key): _strip_prefix(text) for key, text in texts.items()}
+    ids = np.array(sorted(plain), dtype="<i8")
+
+    chunks: list[bytes] = []
+    offsets = [0]
+    for idx in ids.tolist():
+        # each ID holds its own text and the text with its neighbours
+        context = " ".join(
+            part for part in (plain.get(idx - 1, ""), plain[idx], plain.get(idx + 1, "")) if part
+        )
+        for text in (plain[idx], context):
+            data = text.encode("utf-8")
+            chunks.append(data)
+            offsets.append(offsets[-1] + len(data))
+
+    tmp = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(ids)))
+        f.write(ids.tobytes())
+        f.write(np.array(offsets, dtype="<i8").tobytes())
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+    return path
+
+
+def ensure_passage_store(texts_dict_path: str | os.PathLike) -> Path:
+    """Build the store next to a JSON texts dict unless an up to date one exists."""
+    path = store_path(texts_dict_path)
+    if not path.exists() or path.stat().st_mtime_ns < os.stat(texts_dict_path).st_mtime_ns:
+        with open(texts_dict_path, "r", encoding="utf-8") as f:
+            build_passage_store(json.load(f), path)
+    return path
+
+
+class PassageStore:
+    """Read-only view of a passage store file shared through ``mmap``."""
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a passage store")
+        self.ids = np.frombuffer(self._mm, dtype="<i8", count=count, offset=_HEADER.size)
+        self.offsets = np.frombuffer(
+            self._mm, dtype="<i8", count=2 * count + 1, offset=_HEADER.size + 8 * count
+        )
+        self._blob_start = _HEADER.size + 8 * (3 * count + 1)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get(self, idx: int, context: bool = False) -> str:
+        """Return passage ``idx``, optionally joined with its neighbours."""
+        pos = int(np.searchsorted(self.ids, idx))
+        if pos >= len(self.ids) or self.ids[pos] != idx:
+            return ""
+        slot = 2 * pos + (1 if context else 0)
+        start = self._blob_start + int(self.offsets[slot])
+        end = self._blob_start + int(self.offsets[slot + 1])
+        return self._mm[start:end].decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._mm)
+
+    def close(self) -> None:
+        self.ids = self.offsets = None
+        self._mm.close()
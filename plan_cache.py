@@ -0,0 +1,237 @@
+"""Cache of the navigation decisions made by the model.
+
+Speakers repeat the same phrasings many times per talk. When a run for an
+utterance ended with exactly one successful navigation tool call, that call
+is stored under the normalized utterance and the presentation state the run
+started from. ``route_node`` serves later identical (or, with
+``plan_cache_similarity``, near-identical) utterances from the cache without
+calling the model.
+
+Entries are tied to the slide the run started on, since the model's choice
+for phrases like "перейдём к результатам" depends on it. Only
+``open_presentation_tool`` and an ``open_slide`` whose target the model
+found through a content lookup are reused regardless of the current slide.
+Entries expire after ``plan_cache_ttl`` seconds, the least recently used are
+dropped beyond ``plan_cache_size``, and all entries of a deck are dropped
+when the deck file changes.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+import tools
+from config import config
+from metrics import Counter
+from router import tokenize
+from slide_cache import file_digest
+
+PLAN_CACHE_ENABLED = config.get("plan_cache", True)
+PLAN_CACHE_SIZE = config.get("plan_cache_size", 512)
+PLAN_CACHE_TTL = config.get("plan_cache_ttl", 60 * 60)
+# Cosine similarity for near-duplicate lookups with the RAG encoder; off when unset
+PLAN_CACHE_SIMILARITY = config.get("plan_cache_similarity")
+
+NAVIGATION_TOOLS = {
+    tools.open_presentation_tool.name,
+    tools.open_slide.name,
+    tools.next_slide.name,
+    tools.previous_slide.name,
+}
+SLIDE_INDEPENDENT_TOOLS = {tools.open_presentation_tool.name}
+# Read-only tools the model may use to find a target
+LOOKUP_TOOLS = {
+    tools.search_slides_tool.name,
+    tools.list_slides_tool.name,
+    tools.list_presentations_tool.name,
+}
+
+plan_cache_lookups = Counter("plan_cache_lookups_total", "Plan cache lookups by result", ("result",))
+
+
+def normalize(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def _deck_digest(presentation: str | None) -> str | None:
+    if not presentation:
+        return None
+    try:
+        return file_digest(os.path.join(tools.PRESENTATIONS_DIR, presentation))
+    except OSError:
+        return None
+
+
+def _tool_ok(message: ToolMessage) -> bool:
+    try:
+        return json.loads(message.content).get("status") == "ok"
+    except (json.JSONDecodeError, AttributeError):
+        return False
+
+
+class PlanCache:
+    def __init__(self, max_entries: int = PLAN_CACHE_SIZE, ttl: float = PLAN_CACHE_TTL,
+                 similarity: float | None = PLAN_CACHE_SIMILARITY) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        # (utterance, presentation, slide or None) -> entry
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _embed(self, utterance: str):
+        from rag_module import get_encoder
+
+        vector = get_encoder().embed_queries([utterance])[0]
+        return vector / (float((vector ** 2).sum()) ** 0.5 or 1.0)
+
+    def _valid(self, key: tuple, entry: dict, now: float) -> bool:
+        if now - entry["time"] > self.ttl:
+            del self._entries[key]
+            return False
+        return True
+
+    def lookup(self, text: str, presentation: str | None, slide: int | None) -> list[dict] | None:
+        """Return the cached tool calls for ``text`` in this presentation state."""
+        utterance = normalize(text)
+        if not utterance:
+            return None
+        digest = _deck_digest(presentation)
+        now = time.monotonic()
+        with self._lock:
+            entry = None
+            for key in ((utterance, presentation, slide), (utterance, presentation, None)):
+                candidate = self._entries.get(key)
+                if candidate is not None and self._valid(key, candidate, now):
+                    entry = candidate
+                    self._entries.move_to_end(key)
+                    break
+            if entry is not None and entry["digest"] != digest:
+                self._invalidate(presentation)
+                entry = None
+            result = "hit" if entry is not None else "miss"
+
+        if entry is None and self.similarity:
+            entry = self._similar(utterance, presentation, slide, digest, now)
+            result = "similar" if entry is not None else "miss"
+
+        plan_cache_lookups.inc(result=result)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [dict(call) for call in entry["calls"]]
+
+    def _similar(self, utterance: str, presentation, slide, digest, now: float) -> dict | None:
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if key[1] == presentation and key[2] in (slide, None)
+                and entry["digest"] == digest and entry.get("vector") is not None
+                and now - entry["time"] <= self.ttl
+            ]
+        if not candidates:
+            return None
+        vector = self._embed(utterance)
+        score, key, entry = max(
+            ((float(vector @ entry["vector"]), key, entry) for key, entry in candidates), key=lambda item: item[0]
+        )
+        if score < self.similarity:
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry
+
+    def record(self, messages: list[BaseMessage], presentation: str | None, slide: int | None) -> bool:
+        """Store the plan of the run that ends ``messages``, if it is cacheable."""
+        start = max(i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage))
+        turn = messages[start + 1:]
+        # results of the turn's tool calls by ID
+        results = {msg.tool_call_id: msg for msg in turn if isinstance(msg, ToolMessage)}
+
+        calls, looked_up = [], False
+        for msg in turn:
+            if not isinstance(msg, AIMessage) or not msg.tool_calls:
+                continue
+            if msg.name:
+                # routed locally or served from this cache
+                return False
+            for call in msg.tool_calls:
+                if call["name"] in LOOKUP_TOOLS:
+                    looked_up = True
+                elif call["name"] in NAVIGATION_TOOLS:
+                    calls.append(call)
+                else:
+                    return False
+
+        if len(calls) != 1 or not all(
+            call["id"] in results and _tool_ok(results[call["id"]]) for call in calls
+        ):
+            return False
+
+        call = calls[0]
+        independent = call["name"] in SLIDE_INDEPENDENT_TOOLS or (
+            looked_up and call["name"] == tools.open_slide.name
+        )
+        utterance = normalize(messages[start].content)
+        if not utterance:
+            return False
+        key = (utterance, presentation, None if independent else slide)
+        entry = {
+            "calls": [{"name": call["name"], "args": call["args"]}],
+            "digest": _deck_digest(presentation),
+            "time": time.monotonic(),
+            "vector": self._embed(utterance) if self.similarity else None,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def _invalidate(self, presentation: str | None) -> int:
+        stale = [key for key in self._entries if key[1] == presentation]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def invalidate(self, presentation: str | None = None) -> int:
+        """Drop the entries of ``presentation``, or all entries when it is ``None``."""
+        with self._lock:
+            if presentation is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            return self._invalidate(presentation)
+
+    def discard(self, text: str, presentation: str | None, slide: int | None) -> None:
+        """Forget the plan for ``text`` after it failed when replayed."""
+        utterance = normalize(text)
+        with self._lock:
+            for key in ((utterance, presentation, slide), (utterance, presentation, None)):
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+plan_cache = PlanCache()
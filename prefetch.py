@@ -0,0 +1,82 @@
+"""Background warming of slide texts around the slide being shown.
+
+After every navigation the tools call :meth:`Prefetcher.schedule`. A worker
+thread then extracts the texts of the ``window`` slides before and after the
+current one, nearest first, so the next ``next_slide``/``previous_slide``
+finds its text in the slide cache. Only the latest request per deck is kept,
+so a fast run of navigations does not pile up work.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+from config import config
+
+# Slides on each side of the current one to warm; 0 disables prefetching
+PREFETCH_WINDOW = config.get("prefetch_window", 2)
+# Also build the slide search of the open deck in the background
+PREFETCH_SEARCH = config.get("prefetch_search", False)
+
+
+def neighbours(num: int, count: int, window: int) -> list[int]:
+    """0-based slide numbers around ``num``, nearest first, next before previous."""
+    order = []
+    for step in range(1, window + 1):
+        for candidate in (num + step, num - step):
+            if 0 <= candidate < count:
+                order.append(candidate)
+    return order
+
+
+class Prefetcher:
+    def __init__(self, window: int = PREFETCH_WINDOW, search: bool = PREFETCH_SEARCH) -> None:
+        self.window = window
+        self.search = search
+        # latest (slide context, presentation, slide) per deck
+        self._pending: OrderedDict[int, tuple] = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self.stats = {"scheduled": 0, "extracted": 0}
+
+    def schedule(self, ctx) -> None:
+        """Warm the slides around the current slide of ``ctx`` in the background."""
+        prs, num = ctx.presentation, ctx.slide_num
+        if prs is None or num is None or (self.window <= 0 and not self.search):
+            return
+        with self._cond:
+            self._pending.pop(id(prs), None)
+            self._pending[id(prs)] = (ctx, prs, num)
+            self.stats["scheduled"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="slide-prefetch", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                _, (ctx, prs, num) = self._pending.popitem(last=False)
+            try:
+                self._warm(ctx, prs, num)
+            except Exception:
+                # prefetching is best effort; the tools extract on demand
+                pass
+
+    def _warm(self, ctx, prs, num: int) -> None:
+        cache = prs.text_cache
+        for target in neighbours(num, len(cache), self.window):
+            # stop when the deck was closed or a newer request arrived
+            if ctx.presentation is not prs or id(prs) in self._pending:
+                return
+            if cache.peek(target) is None:
+                prs.get_slide_text(target)
+                self.stats["extracted"] += 1
+        if self.search and ctx.presentation is prs:
+            ctx.search  # the first access builds the search over all slides
+
+
+prefetcher = Prefetcher()
@@ -3,77 +3,131 @@
 from __future__ import annotations
 
 import os
+import threading
 from abc import ABC, abstractmethod
 
+from metrics import slide_extract_seconds, viewer_action_seconds
+from slide_cache import SlideTextCache
 from viewer import PresentationViewer
 
-try:
-    from pptx import Presentation as PptxLib
-except Exception:  # pragma: no cover - optional dependency
-    PptxLib = None
+
+# Readers are imported when the first deck of their type is opened
+def _pptx_lib():
+    try:
+        from pptx import Presentation as PptxLib
+    except Exception:  # pragma: no cover - optional dependency
+        return None
+    return PptxLib
+
 
 # optional pdf reader
-try:
-    from PyPDF2 import PdfReader
-except Exception:  # pragma: no cover - optional dependency
-    PdfReader = None
+def _pdf_reader():
+    try:
+        from PyPDF2 import PdfReader
+    except Exception:  # pragma: no cover - optional dependency
+        return None
+    return PdfReader
 
 
 class BasePresentation(ABC):
     def __init__(self, path: str, viewer: PresentationViewer) -> None:
         self.path = path
         self.viewer = viewer
+        self._text_cache: SlideTextCache | None = None
+        # pptx and PyPDF2 objects are not safe to read from several threads
+        self._extract_lock = threading.RLock()
 
     def open(self) -> None:
-        self.viewer.open(self.path)
+        with viewer_action_seconds.time(action="open"):
+            self.viewer.open(self.path)
 
     def close(self) -> None:
+        if self._text_cache is not None:
+            self._text_cache.flush()
         self.viewer.close()
 
     def start_show(self) -> None:
         """Start presentation in fullscreen mode."""
-        self.viewer.start_show()
+        with viewer_action_seconds.time(action="start_show"):
+            self.viewer.start_show()
 
     def goto(self, num: int) -> None:
-        self.viewer.goto_slide(num)
+        with viewer_action_seconds.time(action="goto"):
+            self.viewer.goto_slide(num)
 
     def next_slide(self) -> None:
         """Move to the next slide."""
-        self.viewer.next_slide()
+        with viewer_action_seconds.time(action="next"):
+            self.viewer.next_slide()
 
     def previous_slide(self) -> None:
         """Move to the previous slide."""
-        self.viewer.previous_slide()
+        with viewer_action_seconds.time(action="previous"):
+            self.viewer.previous_slide()
 
     @abstractmethod
     def slides_count(self) -> int:  # pragma: no cover - interface
         ...
 
+    @property
+    def text_cache(self) -> SlideTextCache:
+        """Slide text cache of this deck, created on first access."""
+        if self._text_cache is None:
+            with self._extract_lock:
+                if self._text_cache is None:
+                    self._text_cache = SlideTextCache(self.path, self.slides_count())
+        return self._text_cache
+
+    def _extract_once(self, num: int) -> str:
+        with self._extract_lock:
+            # another thread (e.g. the prefetcher) may have extracted it meanwhile
+            text = self.text_cache.peek(num)
+            if text is not None:
+                return text
+            with slide_extract_seconds.time(format=os.path.splitext(self.path)[1].lstrip(".").lower()):
+                return self._extract_slide_text(num)
+
+    def get_slide_text(self, num: int) -> str:
+        """Return the text of slide ``num`` (0-based), extracting it once."""
+        return self.text_cache.get(num, self._extract_once)
+
+    def get_all_slide_texts(self) -> list[str]:
+        """Return texts of all slides and persist them for later runs."""
+        return self.text_cache.fill(self._extract_once)
+
     @abstractmethod
-    def get_slide_text(self, num: int) -> str:  # pragma: no cover - interface
+    def _extract_slide_text(self, num: int) -> str:  # pragma: no cover - interface
         ...
 
 
 class PptxPresentation(BasePresentation):
     def __init__(self, path: str, viewer: PresentationViewer) -> None:
+        PptxLib = _pptx_lib()
         if PptxLib is None:
             raise RuntimeError("pptx library is not available")
         super().__init__(path, viewer)
         self.prs = PptxLib(path)
+        self._slides_count = len(self.prs.slides)
 
     def slides_count(self) -> int:
-        return len(self.prs.slides)
+        return self._slides_count
 
-    def get_slide_text(self, num: int) -> str:
+    def _extract_slide_text(self, num: int) -> str:
         slide = self.prs.slides[num]
+        title = slide.shapes.title
+        # the title goes first so truncated texts still say what the slide is about
+        shapes = ([title] if title is not None else []) + [
+            shape for shape in slide.shapes if title is None or shape.shape_id != title.shape_id
+        ]
         return "\n".join(
-            shape.text for shape in slide.shapes if hasattr(shape, "text")
+            shape.text for shape in shapes if hasattr(shape, "text") and shape.text
         )
 
 
 class PdfPresentation(BasePresentation):
     def __init__(self, path: str, viewer: PresentationViewer) -> None:
         super().__init__(path, viewer)
+        PdfReader = _pdf_reader()
         if PdfReader is not None:
             try:
                 self.reader = PdfReader(path)
@@ -81,13 +135,14 @@ class PdfPresentation(BasePresentation):
                 self.reader = None
         else:
             self.reader = None
+        # counted once here: PyPDF2 loads pages lazily and is not thread-safe,
+        # later reads go through _extract_lock
+        self._slides_count = len(self.reader.pages) if self.reader is not None else 0
 
     def slides_count(self) -> int:
-        if self.reader is not None:
-            return len(self.reader.pages)
-        return 0
+        return self._slides_count
 
-    def get_slide_text(self, num: int) -> str:
+    def _extract_slide_text(self, num: int) -> str:
         if self.reader is None:
             return ""
         try:
@@ -5,8 +5,6 @@ from typing import List
 
 import yaml
 
-from rag import RagSource
-
 # TODO come up with something better than this
 # prompts_path = Path("./resources") / "prompts.yaml"
 prompts_path = "prompts.yaml"
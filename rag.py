@@ -1,8 +1,17 @@
 """RAG source implementations for retrieving slide-related context."""
 
-from typing import Dict, Any
+import math
+import re
+from collections import Counter
+from typing import Dict, Any, List
 from datetime import datetime
-from rag_module import SimpleSearch
+
+# Words are compared by their first letters, a crude stemmer that makes
+# "выручка" and "выручке" match
+STEM_LENGTH = 5
+SNIPPET_CHARS = 160
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
 
 class RagSource:
     def __init__(self, description: str, source_id: str):
@@ -14,17 +23,24 @@ class RagSource:
 
 class FaissRagSource(RagSource):
     def __init__(self, source_id: str, description: str, index_path: str, texts_dict_path: str):
-        self.engine = SimpleSearch(
+        # torch and faiss are only needed once a FAISS source is configured
+        from rag_module import DEFAULT_ENCODER, registry
+
+        # The index is loaded by the shared registry on the first query
+        registry.register(
+            source_id,
             device="cpu",
             index_path=index_path,
-            encoder_path='intfloat/multilingual-e5-large',
+            encoder_path=DEFAULT_ENCODER,
             texts_dict_path=texts_dict_path
         )
         self.description = description
         self.source_id = source_id
-        
+
     def query(self, query_text: str) -> Dict[str, Any]:
-        query_result = self.engine.search(query=query_text, top_n=2)
+        from rag_module import registry
+
+        query_result = registry.search(self.source_id, query=query_text, top_n=2)
 
         formatted_results = "\n\n".join(
             [f"**Result {i+1}:**\n{result}" for i, result in enumerate(query_result)]
@@ -34,4 +50,73 @@ class FaissRagSource(RagSource):
             "query": query_text,
             "results": formatted_results,
             "metadata": {"timestamp": datetime.now().isoformat()}
-        }
\ No newline at end of file
+        }
+
+def _stems(text: str) -> List[str]:
+    return [word[:STEM_LENGTH] for word in _WORD_RE.findall(text.lower())]
+
+def _snippet(text: str, stems: set, width: int = SNIPPET_CHARS) -> str:
+    """Return up to ``width`` characters of ``text`` around the first matched word."""
+    text = " ".join(text.split())
+    start = 0
+    for match in _WORD_RE.finditer(text):
+        if match.group().lower()[:STEM_LENGTH] in stems:
+            start = max(0, match.start() - width // 4)
+            break
+    snippet = text[start:start + width]
+    return ("…" if start else "") + snippet + ("…" if start + width < len(text) else "")
+
+class SlideSearchSource(RagSource):
+    """BM25 search over the slide texts of one presentation.
+
+    Needs no encoder or prebuilt index, so it is built for the open deck on
+    the first search and returns slide numbers with short snippets instead of
+    whole slide texts.
+    """
+
+    def __init__(self, texts: List[str], source_id: str = "slides",
+                 description: str = "Текст слайдов текущей презентации", k1: float = 1.5, b: float = 0.75):
+        super().__init__(description, source_id)
+        self.texts = texts
+        self.k1 = k1
+        self.b = b
+        self._docs = [Counter(_stems(text)) for text in texts]
+        self._lengths = [sum(doc.values()) for doc in self._docs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        df = Counter(stem for doc in self._docs for stem in doc)
+        n = len(self._docs)
+        self._idf = {stem: math.log(1 + (n - count + 0.5) / (count + 0.5)) for stem, count in df.items()}
+
+    def _score(self, doc: Counter, length: int, stems: List[str]) -> float:
+        score = 0.0
+        norm = self.k1 * (1 - self.b + self.b * length / (self._avg_length or 1))
+        for stem in stems:
+            tf = doc.get(stem)
+            if tf:
+                score += self._idf[stem] * tf * (self.k1 + 1) / (tf + norm)
+        return score
+
+    def search(self, query_text: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """Return up to ``top_k`` matching slides as ``{"number", "score", "snippet"}``."""
+        stems = list(dict.fromkeys(_stems(query_text)))
+        scored = [
+            (self._score(doc, length, stems), num)
+            for num, (doc, length) in enumerate(zip(self._docs, self._lengths))
+        ]
+        best = sorted((item for item in scored if item[0] > 0), key=lambda item: (-item[0], item[1]))[:top_k]
+        return [
+            {"number": num + 1, "score": round(score, 3), "snippet": _snippet(self.texts[num], set(stems))}
+            for score, num in best
+        ]
+
+    def query(self, query_text: str) -> Dict[str, Any]:
+        results = self.search(query_text)
+        formatted_results = "\n\n".join(
+            f"**Слайд {result['number']}:**\n{result['snippet']}" for result in results
+        )
+        return {
+            "source_id": self.source_id,
+            "query": query_text,
+            "results": formatted_results,
+            "metadata": {"timestamp": datetime.now().isoformat()}
+        }
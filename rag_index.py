@@ -0,0 +1,231 @@
+"""Incremental FAISS index over the slides in ``PRESENTATIONS_DIR``.
+
+Every slide becomes one passage. Decks are tracked by size, mtime and
+content hash in a manifest, so a rebuild only re-embeds decks that changed
+and drops decks that were deleted::
+
+    python rag_index.py            # update .rag_index/ incrementally
+    python rag_index.py --full     # rebuild from scratch
+
+The produced ``index.faiss`` and ``texts.json`` are what ``FaissRagSource``
+expects as ``index_path`` and ``texts_dict_path``; the memory-mapped passage
+store ``texts.passages`` is rebuilt alongside.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from config import config
+from passage_store import build_passage_store, store_path
+from presentation import create_presentation
+from rag_module import DEFAULT_ENCODER, build_search_index, get_encoder
+from slide_cache import file_digest
+from tools import PRESENTATIONS_DIR
+from viewer import HeadlessPresentationViewer
+
+INDEX_DIR = Path(config.get("rag_index_dir", ".rag_index"))
+ENCODER_PATH = DEFAULT_ENCODER
+DEVICE = config.get("rag_device", "cpu")
+# flat (exact), hnsw, ivf, pq or ivfpq; see rag_module.build_search_index
+INDEX_TYPE = config.get("rag_index_type", "flat")
+
+INDEX_FILE = "index.faiss"
+# Exact vectors kept for incremental updates; index.faiss is derived from them
+VECTORS_FILE = "vectors.faiss"
+TEXTS_FILE = "texts.json"
+MANIFEST_FILE = "manifest.json"
+
+PASSAGE_PREFIX = "passage: "
+SUPPORTED_EXTENSIONS = {".pptx", ".pdf"}
+
+
+def deck_passages(path: str) -> list[str]:
+    """Return one passage per slide; empty slides give empty strings."""
+    name = os.path.basename(path)
+    prs = create_presentation(path, HeadlessPresentationViewer())
+    return [
+        f"{name}, слайд {num}: {' '.join(text.split())}" if text.strip() else ""
+        for num, text in enumerate(prs.get_all_slide_texts(), start=1)
+    ]
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+class IncrementalIndex:
+    """FAISS index, passage texts and manifest stored in ``index_dir``.
+
+    Each deck owns a contiguous block of IDs (one per slide plus a gap), so
+    neighbour lookups of ``SimpleSearch`` never cross into another deck.
+    """
+
+    def __init__(self, index_dir: Path = INDEX_DIR, encoder_path: str = ENCODER_PATH, device: str = DEVICE,
+                 index_type: str = INDEX_TYPE) -> None:
+        self.index_dir = Path(index_dir)
+        self.encoder_path = encoder_path
+        self.device = device
+        self.index_type = index_type
+        self.index = None
+        self.texts: dict[str, str] = {}
+        self.manifest = {"encoder": encoder_path, "next_id": 0, "files": {}}
+        self._load()
+
+    def _load(self) -> None:
+        manifest_path = self.index_dir / MANIFEST_FILE
+        if not manifest_path.exists():
+            return
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("encoder") != self.encoder_path:
+            # vectors of another encoder cannot be mixed in, start over
+            return
+        self.manifest = manifest
+        vectors_path = self.index_dir / VECTORS_FILE
+        if not vectors_path.exists():
+            # indexes built before VECTORS_FILE existed are flat
+            vectors_path = self.index_dir / INDEX_FILE
+        self.index = faiss.read_index(str(vectors_path))
+        with open(self.index_dir / TEXTS_FILE, "r", encoding="utf-8") as f:
+            self.texts = json.load(f)
+
+    def _embed(self, passages: list[str]) -> np.ndarray:
+        vectors = get_encoder(self.encoder_path, self.device).embed(passages, prefix=PASSAGE_PREFIX)
+        # Unit passage vectors make inner product rank like cosine similarity
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def _new_index(self, dim: int):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+    def remove(self, name: str) -> None:
+        entry = self.manifest["files"].pop(name, None)
+        if entry is None:
+            return
+        start, count = entry["ids"]
+        ids = np.arange(start, start + count, dtype="int64")
+        if self.index is not None:
+            self.index.remove_ids(ids)
+        for idx in ids:
+            self.texts.pop(str(idx), None)
+
+    def add(self, name: str, path: str, signature: dict) -> int:
+        passages = deck_passages(path)
+        start = self.manifest["next_id"]
+        ids = [start + i for i, text in enumerate(passages) if text]
+        # one spare ID keeps the next deck out of this deck's context window
+        self.manifest["next_id"] = start + len(passages) + 1
+        self.manifest["files"][name] = {**signature, "ids": [start, len(passages)]}
+
+        if ids:
+            kept = [passages[i - start] for i in ids]
+            vectors = self._embed(kept)
+            if self.index is None:
+                self.index = self._new_index(vectors.shape[1])
+            self.index.add_with_ids(vectors, np.array(ids, dtype="int64"))
+            for idx, text in zip(ids, kept):
+                self.texts[str(idx)] = PASSAGE_PREFIX + text
+        return len(ids)
+
+    def update(self, presentations_dir: str = PRESENTATIONS_DIR) -> dict:
+        """Bring the index in line with the decks currently on disk."""
+        stats = {"added": 0, "updated": 0, "removed": 0, "skipped": 0, "passages": 0}
+        files = self.manifest["files"]
+        current = {
+            f: os.path.join(presentations_dir, f)
+            for f in sorted(os.listdir(presentations_dir))
+            if os.path.splitext(f)[1].lower() in SUPPORTED_EXTENSIONS
+            and os.path.isfile(os.path.join(presentations_dir, f))
+        }
+
+        for name in list(files):
+            if name not in current:
+                self.remove(name)
+                stats["removed"] += 1
+
+        for name, path in current.items():
+            stat = os.stat(path)
+            entry = files.get(name)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                stats["skipped"] += 1
+                continue
+
+            signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": file_digest(path)}
+            if entry and entry["sha1"] == signature["sha1"]:
+                # touched but not modified
+                entry.update(signature)
+                stats["skipped"] += 1
+                continue
+
+            if entry:
+                self.remove(name)
+                stats["updated"] += 1
+            else:
+                stats["added"] += 1
+            stats["passages"] += self.add(name, path, signature)
+
+        changed = stats["added"] or stats["updated"] or stats["removed"]
+        if changed or self.manifest.get("index_type") != self.index_type or not (self.index_dir / VECTORS_FILE).exists():
+            self.save()
+        return stats
+
+    def vectors(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return all stored passage vectors and their IDs."""
+        ids = faiss.vector_to_array(self.index.id_map).astype("int64")
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        return vectors, ids
+
+    def search_index(self):
+        """Build the index of the configured type that queries are served from."""
+        if self.index_type == "flat" or self.index.ntotal == 0:
+            return self.index
+        return build_search_index(*self.vectors(), index_type=self.index_type)
+
+    def save(self) -> None:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        if self.index is None:
+            self.index = self._new_index(self._embed(["-"]).shape[1])
+        self.manifest["index_type"] = self.index_type
+        # the manifest goes last: it only describes files already replaced
+        _write_atomic(self.index_dir / VECTORS_FILE, lambda p: faiss.write_index(self.index, str(p)))
+        search_index = self.search_index()
+        _write_atomic(self.index_dir / INDEX_FILE, lambda p: faiss.write_index(search_index, str(p)))
+        _write_atomic(
+            self.index_dir / TEXTS_FILE,
+            lambda p: p.write_text(json.dumps(self.texts, ensure_ascii=False), encoding="utf-8"),
+        )
+        build_passage_store(self.texts, store_path(self.index_dir / TEXTS_FILE))
+        _write_atomic(
+            self.index_dir / MANIFEST_FILE,
+            lambda p: p.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=1), encoding="utf-8"),
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or update the slide search index.")
+    parser.add_argument("--presentations-dir", default=PRESENTATIONS_DIR)
+    parser.add_argument("--index-dir", type=Path, default=INDEX_DIR)
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch")
+    args = parser.parse_args()
+
+    if args.full:
+        for name in (MANIFEST_FILE, INDEX_FILE, VECTORS_FILE, TEXTS_FILE):
+            (args.index_dir / name).unlink(missing_ok=True)
+        store_path(args.index_dir / TEXTS_FILE).unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    stats = IncrementalIndex(args.index_dir).update(args.presentations_dir)
+    print(", ".join(f"{k}: {v}" for k, v in stats.items()) + f" ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
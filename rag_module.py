@@ -1,10 +1,36 @@
 """Lightweight FAISS-based retrieval module for semantic search."""
 
+import os
+import threading
+import time
+from collections import OrderedDict
+
 import torch
-import json
 import faiss
+import numpy as np
 from transformers import AutoTokenizer, AutoModel
-from typing import Dict
+from typing import Dict, List, Tuple
+
+from config import config
+from passage_store import PassageStore, ensure_passage_store
+
+# Query embeddings kept in memory, keyed by normalized query text
+QUERY_CACHE_SIZE = config.get("rag_query_cache_size", 1024)
+ENCODE_BATCH_SIZE = config.get("rag_batch_size", 32)
+DEFAULT_ENCODER = config.get("rag_encoder", 'intfloat/multilingual-e5-large')
+# int8 dynamic quantization of the encoder's linear layers on CPU
+QUANTIZE_ENCODER = config.get("rag_encoder_quantize", False)
+# Search-time parameters of approximate indexes
+NPROBE = config.get("rag_nprobe", 8)
+EF_SEARCH = config.get("rag_ef_search", 64)
+# Bytes of loaded indexes and passages kept in memory by IndexRegistry
+MEMORY_BUDGET = int(config.get("rag_memory_budget_mb", 2048)) * 1024 * 1024
+# Seconds between checks whether a loaded index was rebuilt on disk
+RELOAD_CHECK_INTERVAL = config.get("rag_reload_check_interval", 5)
+
+# Intra-op threads used by torch on CPU hosts (torch default when unset)
+if config.get("rag_threads"):
+    torch.set_num_threads(int(config["rag_threads"]))
 
 def average_pool(last_hidden_states: torch.Tensor,
                  attention_mask: torch.Tensor) -> torch.Tensor:
@@ -12,63 +38,235 @@ def average_pool(last_hidden_states: torch.Tensor,
     last_hidden = last_hidden_states.masked_fill(~attention_mask[..., None].bool(), 0.0)
     return last_hidden.sum(dim=1) / attention_mask.sum(dim=1, keepdim=True)
 
-def get_prompt_embedding(encoder, tokenizer, prompt_text, device: str) -> 'np.ndarray':
-    prompt_prefix = 'query: '
-    tokenized = tokenizer(
-        prompt_prefix + prompt_text,
-        truncation=True,
-        padding=True,
-        return_tensors='pt'
-    )
-    # Move all tensors to the specified device.
-    tokenized = {k: v.to(device) for k, v in tokenized.items()}
-    outputs = encoder(tokenized['input_ids'])
-    pooled = average_pool(outputs.last_hidden_state, tokenized['attention_mask'])
-    # Convert to CPU numpy array for FAISS.
-    return pooled.detach().to('cpu').numpy()
+def normalize_query(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+def encode_texts(encoder, tokenizer, texts: List[str], device: str,
+                 prefix: str = 'query: ', batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+    """Embed ``texts`` in batches without tracking gradients."""
+    embeddings = []
+    with torch.inference_mode():
+        for start in range(0, len(texts), batch_size):
+            batch = [prefix + text for text in texts[start:start + batch_size]]
+            tokenized = tokenizer(
+                batch,
+                truncation=True,
+                padding=True,
+                return_tensors='pt'
+            )
+            # Move all tensors to the specified device.
+            tokenized = {k: v.to(device) for k, v in tokenized.items()}
+            outputs = encoder(**tokenized)
+            pooled = average_pool(outputs.last_hidden_state, tokenized['attention_mask'])
+            # Convert to CPU numpy array for FAISS.
+            embeddings.append(pooled.to('cpu').numpy())
+    return np.concatenate(embeddings).astype('float32')
+
+def get_prompt_embedding(encoder, tokenizer, prompt_text, device: str) -> np.ndarray:
+    return encode_texts(encoder, tokenizer, [prompt_text], device)
+
+def load_encoder(encoder_path: str, device: str, quantize: bool = False):
+    """Load the tokenizer and encoder model in evaluation mode."""
+    tokenizer = AutoTokenizer.from_pretrained(encoder_path)
+    encoder = AutoModel.from_pretrained(encoder_path).to(device).eval()
+    if quantize and device == 'cpu':
+        encoder = torch.ao.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizer, encoder
+
+def _largest_divisor(n: int, limit: int) -> int:
+    return max(m for m in range(1, min(n, limit) + 1) if n % m == 0)
+
+def build_search_index(vectors: np.ndarray, ids: np.ndarray, index_type: str = 'flat',
+                       nlist: int = None, pq_m: int = 64, hnsw_m: int = 32):
+    """Build an inner-product FAISS index of ``index_type`` over ``vectors``.
+
+    Supported types are ``flat`` (exact), ``hnsw``, ``ivf``, ``pq`` and
+    ``ivfpq``. Collections too small to train product quantizers fall back
+    to ``flat``/``ivf``.
+    """
+    n, dim = vectors.shape
+    index_type = index_type.lower()
+    # 8-bit product quantizers need at least 256 training vectors
+    if n < 256 and index_type in ('pq', 'ivfpq'):
+        index_type = 'flat' if index_type == 'pq' else 'ivf'
+    nlist = min(nlist or int(4 * np.sqrt(max(n, 1))), max(1, n // 39))
+    pq_m = _largest_divisor(dim, pq_m)
+
+    descriptions = {
+        'flat': 'Flat',
+        'hnsw': f'HNSW{hnsw_m},Flat',
+        'ivf': f'IVF{nlist},Flat',
+        'pq': f'PQ{pq_m}',
+        'ivfpq': f'IVF{nlist},PQ{pq_m}',
+    }
+    if index_type not in descriptions:
+        raise ValueError(f"Unsupported index type: {index_type}")
+
+    base = faiss.index_factory(dim, descriptions[index_type], faiss.METRIC_INNER_PRODUCT)
+    if not base.is_trained:
+        base.train(vectors)
+    index = faiss.IndexIDMap2(base)
+    index.add_with_ids(vectors, ids)
+    return index
+
+def set_search_params(index, nprobe: int = NPROBE, ef_search: int = EF_SEARCH) -> None:
+    """Apply search-time parameters to IVF and HNSW indexes."""
+    inner = faiss.downcast_index(index.index) if hasattr(index, 'id_map') else index
+    if hasattr(inner, 'nprobe'):
+        inner.nprobe = nprobe
+    if hasattr(inner, 'hnsw'):
+        inner.hnsw.efSearch = ef_search
+
+class Encoder:
+    """Tokenizer and model shared by every index embedded with them."""
+
+    def __init__(self, encoder_path: str, device: str, quantize: bool = False):
+        self.encoder_path = encoder_path
+        self.device = device
+        self.tokenizer, self.model = load_encoder(encoder_path, device, quantize)
+        self._query_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def embed(self, texts: List[str], prefix: str = 'passage: ') -> np.ndarray:
+        return encode_texts(self.model, self.tokenizer, texts, self.device, prefix=prefix)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries in one batch, reusing cached embeddings."""
+        keys = [normalize_query(query) for query in queries]
+        with self._cache_lock:
+            cached = {key: self._query_cache[key] for key in keys if key in self._query_cache}
+            for key in cached:
+                self._query_cache.move_to_end(key)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in cached))
+        if missing:
+            vectors = encode_texts(self.model, self.tokenizer, missing, self.device)
+            with self._cache_lock:
+                for key, vector in zip(missing, vectors):
+                    cached[key] = self._query_cache[key] = vector
+                while len(self._query_cache) > QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+
+        return np.stack([cached[key] for key in keys])
+
+_encoders: Dict[Tuple[str, str, bool], Encoder] = {}
+_encoders_lock = threading.Lock()
+
+def get_encoder(encoder_path: str = DEFAULT_ENCODER, device: str = 'cpu',
+                quantize: bool = QUANTIZE_ENCODER) -> Encoder:
+    """Return the process-wide encoder for ``(encoder_path, device, quantize)``."""
+    key = (encoder_path, device, bool(quantize))
+    with _encoders_lock:
+        if key not in _encoders:
+            _encoders[key] = Encoder(encoder_path, device, quantize)
+        return _encoders[key]
 
 class SimpleSearch:
-    _instance = None        
-
-    def __new__(cls, encoder_path: str = 'intfloat/multilingual-e5-large', device: str = 'cuda', *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super(SimpleSearch, cls).__new__(cls)
-            cls._instance.tokenizer = AutoTokenizer.from_pretrained(encoder_path)
-            cls._instance.encoder = AutoModel.from_pretrained(encoder_path).to(device)
-            cls._instance.device = device
-        return cls._instance
-    
-    def __init__(self, index_path: str, texts_dict_path: str, *args, **kwargs):
+    def __init__(self, index_path: str, texts_dict_path: str,
+                 encoder_path: str = DEFAULT_ENCODER, device: str = 'cpu', *args, **kwargs):
+        self.encoder = get_encoder(encoder_path, device)
         # Load the FAISS index.
         self.index = faiss.read_index(index_path)
-        # Load the texts dictionary from file.
-        with open(texts_dict_path, 'r') as fin:
-            self.texts_dict = json.load(fin)
-    
+        set_search_params(self.index)
+        # Map the passages, converting the JSON texts dictionary on first use.
+        self.passages = PassageStore(ensure_passage_store(texts_dict_path))
+        self.nbytes = os.path.getsize(index_path) + self.passages.nbytes
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        return self.encoder.embed_queries(queries)
+
+    def search_many(self, queries: List[str], prefix: str = 'passage', add_context: bool = True, top_n: int = 5) -> List[List[str]]:
+        """Search several queries with one encoder pass and one FAISS call.
+
+        ``prefix`` is kept for compatibility: passage prefixes are stripped
+        when the passage store is built.
+        """
+        if not queries:
+            return []
+        prompts = self.embed_queries(queries)
+        distances, indices = self.index.search(prompts, top_n)
+        return [
+            [self.passages.get(int(idx), context=add_context) for idx in row if idx >= 0]
+            for row in indices
+        ]
+
     def search(self, query: str, prefix: str = 'passage', add_context: bool = True, top_n: int = 5):
-        # Compute the query embedding.
-        prompt = get_prompt_embedding(self.encoder, self.tokenizer, query, self.device)
-        distances, indices = self.index.search(prompt, top_n)
-        results = []
-        texts_count = len(self.texts_dict)
-        
-        for idx in indices[0]:
-            parts = []
-            # Add previous context if available.
-            if add_context and idx > 0:
-                prev_text = self.texts_dict.get(str(idx - 1), '')
-                prev_text = prev_text.replace(prefix, '', 1).strip()
-                if prev_text:
-                    parts.append(prev_text)
-            # Main text.
-            main_text = self.texts_dict.get(str(idx), '')
-            main_text = main_text.replace(prefix, '', 1).strip()
-            parts.append(main_text)
-            # Add next context if available.
-            if add_context and idx < texts_count - 1:
-                next_text = self.texts_dict.get(str(idx + 1), '')
-                next_text = next_text.replace(prefix, '', 1).strip()
-                if next_text:
-                    parts.append(next_text)
-            results.append(' '.join(parts))
-        return results
\ No newline at end of file
+        return self.search_many([query], prefix=prefix, add_context=add_context, top_n=top_n)[0]
+
+class IndexRegistry:
+    """Named search indexes loaded on first query and kept under a memory budget.
+
+    Indexes share encoders through :func:`get_encoder`. Least recently used
+    indexes are unloaded when the budget is exceeded and reloaded on their
+    next query. When the index or texts file of a loaded index changes on
+    disk, the new version is loaded aside and swapped in atomically.
+    """
+
+    def __init__(self, memory_budget: int = MEMORY_BUDGET, check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.memory_budget = memory_budget
+        self.check_interval = check_interval
+        self._specs: Dict[str, dict] = {}
+        self._loaded: "OrderedDict[str, Tuple[SimpleSearch, tuple, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One load at a time per index name
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, index_path: str, texts_dict_path: str,
+                 encoder_path: str = DEFAULT_ENCODER, device: str = 'cpu') -> None:
+        spec = dict(index_path=index_path, texts_dict_path=texts_dict_path,
+                    encoder_path=encoder_path, device=device)
+        with self._lock:
+            if self._specs.get(name) != spec:
+                self._specs[name] = spec
+                self._loaded.pop(name, None)
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def _signature(self, spec: dict) -> tuple:
+        return tuple(os.stat(spec[key]).st_mtime_ns for key in ('index_path', 'texts_dict_path'))
+
+    def get(self, name: str) -> SimpleSearch:
+        now = time.monotonic()
+        with self._lock:
+            spec = self._specs[name]
+            entry = self._loaded.get(name)
+            if entry is not None:
+                self._loaded.move_to_end(name)
+                if now - entry[2] < self.check_interval:
+                    return entry[0]
+
+        signature = self._signature(spec)
+        if entry is not None and entry[1] == signature:
+            with self._lock:
+                if name in self._loaded:
+                    self._loaded[name] = (entry[0], signature, now)
+            return entry[0]
+
+        with self._load_locks[name]:
+            with self._lock:
+                current = self._loaded.get(name)
+            if current is not None and current[1] == signature:
+                return current[0]
+            # Queries keep using the old version until the new one is ready
+            search = SimpleSearch(**spec)
+            with self._lock:
+                self._loaded[name] = (search, signature, time.monotonic())
+                self._loaded.move_to_end(name)
+                self._evict(keep=name)
+        return search
+
+    def _evict(self, keep: str) -> None:
+        total = sum(entry[0].nbytes for entry in self._loaded.values())
+        for name in list(self._loaded):
+            if total <= self.memory_budget:
+                break
+            if name != keep:
+                total -= self._loaded.pop(name)[0].nbytes
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._loaded)
+
+    def search(self, name: str, query: str, **kwargs) -> List[str]:
+        return self.get(name).search(query, **kwargs)
+
+registry = IndexRegistry()
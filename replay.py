@@ -0,0 +1,194 @@
+"""Replay recorded agent runs offline and deterministically.
+
+Runs of a trace written by ``traces.py`` are fed back through ``graph`` in
+their original order. The LLM is replaced by :class:`RecordedModel`, which
+answers with the recorded responses, and the viewer by the headless one, so
+only the code in ``nodes.py``/``tools.py`` is measured::
+
+    python replay.py traces/20250101-120000-42.jsonl --presentations-dir decks
+    python replay.py trace.jsonl --session room-1 --repeats 5 --output replay.json
+
+The report compares per-node time of the recording (which includes the LLM)
+with the replay (which does not) and counts tool results that differ.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from collections import defaultdict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import model
+import tools
+from graph import graph
+from nodes import LOCAL_PLANNERS
+from plan_cache import plan_cache
+from sessions import Session
+from token_counter import count_tokens
+from traces import load_runs, message_from_record
+
+
+class RecordedModel:
+    """Chat model stub answering with the recorded responses of one run."""
+
+    def __init__(self, responses: list[AIMessage]) -> None:
+        self.responses = list(responses)
+        self.missing = 0
+
+    def bind_tools(self, tools_list):
+        return self
+
+    def get_num_tokens_from_messages(self, messages, tools=None) -> int:
+        return count_tokens(messages)
+
+    def invoke(self, messages, config=None, **kwargs) -> AIMessage:
+        if not self.responses:
+            # the replay asked the model more often than the recording did
+            self.missing += 1
+            return AIMessage(content="")
+        return self.responses.pop(0)
+
+    async def ainvoke(self, messages, config=None, **kwargs) -> AIMessage:
+        return self.invoke(messages, config, **kwargs)
+
+    def get_models(self):
+        return None
+
+
+def _responses(run: dict) -> list[AIMessage]:
+    return [
+        message_from_record(record)
+        for step in run["steps"] if step["node"] == "reflect"
+        for record in step["messages"] if record["type"] == "ai" and record.get("name") not in LOCAL_PLANNERS
+    ]
+
+
+def _tool_outputs(messages) -> list[tuple[str, str]]:
+    return [(msg.name, msg.content) for msg in messages if isinstance(msg, ToolMessage)]
+
+
+def _restore_state(session: Session, state: dict) -> None:
+    """Open the deck and slide a session was on when its first run was recorded."""
+    presentation, slide = state.get("current_presentation"), state.get("current_slide")
+    if not presentation:
+        return
+    result = tools.open_presentation_tool.invoke({"presentation_name": presentation})
+    if result.get("status") != "ok":
+        print(f"Cannot restore {presentation}: {result.get('message')}")
+        return
+    session.state["current_presentation"] = presentation
+    session.state["current_slide"] = 1
+    if slide and slide > 1:
+        result = tools.open_slide.invoke({"slide_number": slide})
+        if result.get("status") == "ok":
+            session.state["current_slide"] = slide
+
+
+def replay_runs(runs: list[dict]) -> dict:
+    """Replay ``runs`` once and return timings and divergences."""
+    sessions: dict[str, Session] = {}
+    recorded_ms: dict[str, list[float]] = defaultdict(list)
+    replayed_ms: dict[str, list[float]] = defaultdict(list)
+    mismatches = []
+    missing_responses = 0
+    # every repeat starts cold, like the recording did
+    plan_cache.invalidate()
+
+    for run in runs:
+        session = sessions.get(run["session"])
+        if session is None:
+            session = sessions[run["session"]] = Session(run["session"])
+            tools.set_slide_context(session.slides)
+            # traces may start mid-talk, with a deck already open
+            _restore_state(session, run.get("state") or {})
+        tools.set_slide_context(session.slides)
+        stub = RecordedModel(_responses(run))
+        model.set_model_override(stub)
+
+        session.memory.add(HumanMessage(content=run["text"]))
+        produced = []
+        last = time.perf_counter()
+        for update in graph.stream(session.graph_input(), stream_mode="updates"):
+            now = time.perf_counter()
+            for node, node_update in update.items():
+                replayed_ms[node].append((now - last) * 1000)
+                for msg in (node_update or {}).get("messages", []):
+                    if session.memory.add(msg):
+                        produced.append(msg)
+                for key in ("current_slide", "current_presentation"):
+                    if node_update and node_update.get(key) is not None:
+                        session.state[key] = node_update[key]
+            last = now
+
+        for step in run["steps"]:
+            recorded_ms[step["node"]].append(step["elapsed_ms"])
+        expected = [
+            (record.get("name"), record["content"])
+            for step in run["steps"] for record in step["messages"] if record["type"] == "tool"
+        ]
+        actual = _tool_outputs(produced)
+        if expected != actual:
+            mismatches.append({"run": run["run"], "text": run["text"], "expected": expected, "actual": actual})
+        missing_responses += stub.missing
+
+    model.set_model_override(None)
+    for session in sessions.values():
+        session.close()
+
+    nodes = sorted(set(recorded_ms) | set(replayed_ms))
+    return {
+        "runs": len(runs),
+        "nodes": {
+            node: {
+                "recorded_ms": sum(recorded_ms[node]),
+                "replayed_ms": sum(replayed_ms[node]),
+                "replayed_mean_ms": statistics.fmean(replayed_ms[node]) if replayed_ms[node] else 0.0,
+            }
+            for node in nodes
+        },
+        "mismatches": mismatches,
+        "missing_responses": missing_responses,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", help="JSONL trace written with trace_dir set")
+    parser.add_argument("--presentations-dir", default=tools.PRESENTATIONS_DIR)
+    parser.add_argument("--session", default=None, help="replay only this session")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", default=None, help="write the report of the last repeat as JSON")
+    args = parser.parse_args()
+
+    tools.PRESENTATIONS_DIR = args.presentations_dir
+    tools.OS_TYPE = "headless"
+
+    runs = [
+        run for run in load_runs(args.trace)
+        if run["end"] is not None and run["end"]["status"] == "ok"
+        and (args.session is None or run["session"] == args.session)
+    ]
+    totals = []
+    for _ in range(args.repeats):
+        report = replay_runs(runs)
+        totals.append(sum(node["replayed_ms"] for node in report["nodes"].values()))
+
+    print(f"{report['runs']} runs, replay total {statistics.median(totals):.1f}ms (median of {args.repeats})")
+    print(f"{'node':<10} {'recorded ms':>12} {'replayed ms':>12}")
+    for node, stats in report["nodes"].items():
+        print(f"{node:<10} {stats['recorded_ms']:>12.1f} {stats['replayed_ms']:>12.1f}")
+    if report["mismatches"] or report["missing_responses"]:
+        print(f"Diverged: {len(report['mismatches'])} runs with different tool results, "
+              f"{report['missing_responses']} model calls without a recorded response")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
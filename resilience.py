@@ -0,0 +1,247 @@
+"""Deadline-bound LLM invocation with timeouts, hedging and a circuit breaker.
+
+Every agent run gets a latency budget (``model_deadline``) shared by all of
+its model calls. Each attempt is cut off after ``model_attempt_timeout``
+seconds and retried with exponential backoff while the budget lasts. With
+``model_hedge_delay`` set, an attempt that has not answered after that many
+seconds gets a second, identical request and the first answer wins.
+
+Consecutive failures open :data:`breaker`; while it is open calls fail at
+once with :class:`ModelUnavailable` instead of waiting for a degraded
+provider, and after ``model_breaker_reset`` seconds one probe call decides
+whether to close it again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from colorama import Fore, Style
+
+from config import config
+from metrics import Counter, model_call_seconds, model_retries
+
+# Seconds one agent run may spend waiting for the model in total
+MODEL_DEADLINE = config.get("model_deadline", 30)
+MODEL_ATTEMPT_TIMEOUT = config.get("model_attempt_timeout", 10)
+MODEL_MAX_ATTEMPTS = config.get("model_max_attempts", 5)
+# Seconds before a hedged duplicate request is sent; off when unset
+MODEL_HEDGE_DELAY = config.get("model_hedge_delay")
+BREAKER_FAILURES = config.get("model_breaker_failures", 5)
+BREAKER_RESET = config.get("model_breaker_reset", 30)
+
+model_hedges = Counter("model_hedged_requests_total", "Duplicate LLM requests sent after model_hedge_delay")
+model_breaker_transitions = Counter(
+    "model_breaker_transitions_total", "Circuit breaker state changes", ("state",)
+)
+model_breaker_rejections = Counter("model_breaker_rejections_total", "LLM calls refused by the open circuit breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Blocking model calls run here so that the caller can stop waiting for them
+_executor = ThreadPoolExecutor(max_workers=config.get("model_threads", 8), thread_name_prefix="model-call")
+
+
+class ModelUnavailable(Exception):
+    """The model cannot answer within the budget or the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = BREAKER_FAILURES, reset: float = BREAKER_RESET) -> None:
+        self.failures = failures
+        self.reset = reset
+        self.state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            model_breaker_transitions.inc(state=state)
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now; lets one probe through after ``reset``.
+
+        A probe that reports nothing within ``reset`` is given up and another
+        one is let through.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (self.state == OPEN and now - self._opened_at >= self.reset) or (
+                self.state == HALF_OPEN and now - self._probe_at >= self.reset
+            ):
+                self._set(HALF_OPEN)
+                self._probe_at = now
+                return True
+            allowed = self.state == CLOSED
+        if not allowed:
+            model_breaker_rejections.inc()
+        return allowed
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._set(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._consecutive >= self.failures):
+                self._opened_at = time.monotonic()
+                self._set(OPEN)
+                print(
+                    f"{Fore.RED}Model circuit breaker opened after {self._consecutive} failures{Style.RESET_ALL}",
+                    file=sys.stderr,
+                )
+
+    def record_abandoned(self) -> None:
+        """A call was cancelled before it answered; a probe counts as failed."""
+        with self._lock:
+            probing = self.state == HALF_OPEN
+        if probing:
+            self.record_failure()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._consecutive}
+
+
+breaker = CircuitBreaker()
+
+
+def deadline_from_now(budget: float | None = None) -> float:
+    return time.monotonic() + (MODEL_DEADLINE if budget is None else budget)
+
+
+def retry_delay(attempt: int, coef: float = 0.2) -> float:
+    return coef * (2 ** (attempt - 1))
+
+
+def _submit(model, conversation, config):
+    # keep callbacks and the slide context of the calling run
+    return _executor.submit(contextvars.copy_context().run, model.invoke, conversation, config)
+
+
+def _invoke_attempt(model, conversation, config, timeout: float):
+    """One attempt, hedged when configured; raises ``TimeoutError`` after ``timeout``."""
+    ends_at = time.monotonic() + timeout
+    pending = {_submit(model, conversation, config)}
+    hedged = MODEL_HEDGE_DELAY is None
+    error = None
+    while pending:
+        remaining = ends_at - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(
+            pending, timeout=remaining if hedged else min(remaining, MODEL_HEDGE_DELAY), return_when=FIRST_COMPLETED
+        )
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+        if not done and not hedged:
+            hedged = True
+            model_hedges.inc()
+            pending.add(_submit(model, conversation, config))
+    if error is not None and not pending:
+        raise error
+    raise TimeoutError(f"no model response in {timeout:.1f}s")
+
+
+async def _ainvoke_attempt(model, conversation, config, timeout: float):
+    """Async version of :func:`_invoke_attempt`; losing requests are cancelled."""
+    ends_at = time.monotonic() + timeout
+    pending = {asyncio.ensure_future(model.ainvoke(conversation, config))}
+    hedged = MODEL_HEDGE_DELAY is None
+    error = None
+    try:
+        while pending:
+            remaining = ends_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining if hedged else min(remaining, MODEL_HEDGE_DELAY),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if not done and not hedged:
+                hedged = True
+                model_hedges.inc()
+                pending.add(asyncio.ensure_future(model.ainvoke(conversation, config)))
+    finally:
+        for task in pending:
+            task.cancel()
+    if error is not None and not pending:
+        raise error
+    raise TimeoutError(f"no model response in {timeout:.1f}s")
+
+
+def _failed(attempt: int, max_attempts: int, deadline: float, error: Exception, started: float) -> float:
+    """Account for a failed attempt and return the backoff before the next one."""
+    outcome = "timeout" if isinstance(error, TimeoutError) else "error"
+    model_call_seconds.observe(time.perf_counter() - started, outcome=outcome)
+    breaker.record_failure()
+    delay = retry_delay(attempt)
+    if attempt == max_attempts or deadline - time.monotonic() <= delay:
+        raise ModelUnavailable(f"model failed after {attempt} attempts: {error!r}") from error
+    model_retries.inc()
+    return delay
+
+
+def _attempt_timeout(deadline: float) -> float:
+    if not breaker.allow():
+        raise ModelUnavailable("model circuit breaker is open")
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise ModelUnavailable("model deadline exceeded")
+    return min(MODEL_ATTEMPT_TIMEOUT, remaining)
+
+
+def invoke_model(model, conversation, config, deadline: float, max_attempts: int = MODEL_MAX_ATTEMPTS):
+    """Call ``model.invoke`` with retries until ``deadline`` (a ``time.monotonic`` value)."""
+    for attempt in range(1, max_attempts + 1):
+        timeout = _attempt_timeout(deadline)
+        started = time.perf_counter()
+        try:
+            response = _invoke_attempt(model, conversation, config, timeout)
+        except Exception as e:
+            time.sleep(_failed(attempt, max_attempts, deadline, e, started))
+            continue
+        except BaseException:
+            breaker.record_abandoned()
+            raise
+        model_call_seconds.observe(time.perf_counter() - started, outcome="ok")
+        breaker.record_success()
+        return response
+
+
+async def ainvoke_model(model, conversation, config, deadline: float, max_attempts: int = MODEL_MAX_ATTEMPTS):
+    """Async version of :func:`invoke_model`."""
+    for attempt in range(1, max_attempts + 1):
+        timeout = _attempt_timeout(deadline)
+        started = time.perf_counter()
+        try:
+            response = await _ainvoke_attempt(model, conversation, config, timeout)
+        except Exception as e:
+            await asyncio.sleep(_failed(attempt, max_attempts, deadline, e, started))
+            continue
+        except BaseException:
+            # cancelled, e.g. superseded by a newer transcript segment
+            breaker.record_abandoned()
+            raise
+        model_call_seconds.observe(time.perf_counter() - started, outcome="ok")
+        breaker.record_success()
+        return response
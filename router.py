@@ -0,0 +1,280 @@
+"""Deterministic matcher for simple navigation commands.
+
+Short utterances like "следующий слайд", "назад" or "слайд пятый" do not need
+the LLM: :func:`route_command` recognizes them locally and returns the tool
+call to execute. Anything it is not sure about yields ``None`` so the caller
+can fall back to the model.
+"""
+
+from __future__ import annotations
+
+import difflib
+import re
+
+NEXT = "next"
+PREV = "prev"
+SLIDE = "slide"
+NUMBER = "number"
+FILLER = "filler"
+# "далее" moves forward only next to a slide noun: "и так далее" is speech
+NEXT_WITH_SLIDE = "next_with_slide"
+
+_KEYWORDS = {
+    NEXT: {
+        "следующий", "следующая", "следующее", "следующему", "следующую", "следующего",
+        "дальше", "вперед",
+        "next", "forward",
+    },
+    NEXT_WITH_SLIDE: {"далее"},
+    PREV: {
+        "предыдущий", "предыдущая", "предыдущее", "предыдущему", "предыдущую", "предыдущего",
+        "прошлый", "прошлая", "прошлому", "прошлую", "прошлого",
+        "назад", "обратно",
+        "previous", "prev", "back", "backward", "backwards",
+    },
+    SLIDE: {
+        "слайд", "слайда", "слайду", "слайде", "слайдом", "слайды", "слайдов",
+        "страница", "страницу", "страницы", "странице", "страниц",
+        "slide", "slides", "page",
+    },
+    FILLER: {
+        "пожалуйста", "давай", "давайте", "ну", "так", "вот", "теперь", "а", "и", "еще",
+        "покажи", "покажите", "показать", "открой", "откройте", "открыть",
+        "перейди", "перейдите", "перейти", "переключи", "переключите", "переключись",
+        "листай", "листни", "верни", "вернись", "вернитесь", "вернемся",
+        "иди", "идем", "пойдем", "на", "к", "ко", "номер",
+        "й", "ой", "ый", "ий", "го", "ого", "ему", "му",
+        "please", "go", "to", "the", "show", "open", "switch", "move", "lets", "let", "us",
+        "me", "number", "a", "ok", "okay", "now", "and",
+    },
+}
+
+# Exact spellings of numbers too short or irregular for stem matching
+_NUMBER_WORDS = {
+    "один": 1, "одна": 1, "одну": 1, "одного": 1, "два": 2, "две": 2, "двух": 2,
+    "три": 3, "трех": 3, "четыре": 4, "четырех": 4,
+    "семь": 7, "восемь": 8, "сорок": 40, "сто": 100,
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18,
+    "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90, "hundred": 100,
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6,
+    "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11,
+    "twelfth": 12, "thirteenth": 13, "fourteenth": 14, "fifteenth": 15,
+    "sixteenth": 16, "seventeenth": 17, "eighteenth": 18, "nineteenth": 19,
+    "twentieth": 20, "thirtieth": 30, "fortieth": 40, "fiftieth": 50,
+}
+
+# Stems of Russian cardinals and ordinals; matched longest first so that
+# "пятнадцатый" is not read as "пятый"
+_NUMBER_STEMS = sorted(
+    {
+        "перв": 1, "втор": 2, "трет": 3, "четверт": 4, "пят": 5, "шест": 6,
+        "седьм": 7, "восьм": 8, "девят": 9, "десят": 10,
+        "одиннадцат": 11, "двенадцат": 12, "тринадцат": 13, "четырнадцат": 14,
+        "пятнадцат": 15, "шестнадцат": 16, "семнадцат": 17, "восемнадцат": 18,
+        "девятнадцат": 19, "двадцат": 20, "тридцат": 30, "сороков": 40,
+        "пятьдесят": 50, "пятидесят": 50, "шестьдесят": 60, "шестидесят": 60,
+        "семьдесят": 70, "семидесят": 70, "восемьдесят": 80, "восьмидесят": 80,
+        "девяност": 90, "сот": 100,
+    }.items(),
+    key=lambda item: len(item[0]),
+    reverse=True,
+)
+# Endings a stem may take; anything else ("пятница", "вторник") is not a number
+_NUMBER_ENDINGS = {
+    "", "ь", "и", "ью", "а", "о",
+    "ый", "ий", "ой", "ая", "яя", "ое", "ее", "ые", "ие", "ого", "его", "ому", "ему",
+    "ом", "ем", "ую", "юю", "ей", "ых", "их", "ым", "им", "ыми", "ими",
+    "ья", "ье", "ьего", "ьему", "ьем", "ьей", "ьи", "ьих", "ьим", "ьими",
+}
+
+_DIGITS_RE = re.compile(r"^(\d+)(?:st|nd|rd|th)?$")
+_TOKEN_RE = re.compile(r"[\w']+")
+# Boundaries between the parts of a longer utterance
+_CLAUSE_RE = re.compile(r"[,.;:!?]+|\s+(?:и|а|потом|затем|then|and)\s+", re.IGNORECASE)
+
+# Minimum similarity for treating an unknown word as a misheard keyword
+_FUZZY_CUTOFF = 0.8
+_FUZZY_MIN_LENGTH = 5
+_FUZZY_VOCABULARY = {
+    word: kind for kind, words in _KEYWORDS.items() for word in words if len(word) >= _FUZZY_MIN_LENGTH
+}
+
+# Utterances longer than this are treated as speech, not commands
+MAX_COMMAND_WORDS = 8
+
+
+def _number_value(token: str) -> int | None:
+    match = _DIGITS_RE.match(token)
+    if match:
+        return int(match.group(1))
+    if token in _NUMBER_WORDS:
+        return _NUMBER_WORDS[token]
+    for stem, value in _NUMBER_STEMS:
+        if token.startswith(stem) and token[len(stem):] in _NUMBER_ENDINGS:
+            return value
+    return None
+
+
+def _classify(token: str) -> tuple[str, int | None] | None:
+    for kind, words in _KEYWORDS.items():
+        if token in words:
+            return kind, None
+
+    value = _number_value(token)
+    if value is not None:
+        return NUMBER, value
+
+    if len(token) >= _FUZZY_MIN_LENGTH:
+        close = difflib.get_close_matches(token, _FUZZY_VOCABULARY, n=1, cutoff=_FUZZY_CUTOFF)
+        if close:
+            return _FUZZY_VOCABULARY[close[0]], None
+    return None
+
+
+def _join_numbers(tokens: list[tuple[str, int | None]]) -> list[tuple[str, int | None]]:
+    """Merge spelled-out compounds like "двадцать пять" into one number."""
+    joined: list[tuple[str, int | None]] = []
+    for kind, value in tokens:
+        if kind == NUMBER and joined and joined[-1][0] == NUMBER:
+            previous = joined[-1][1]
+            limit = 100 if previous == 100 else 10
+            if previous >= 20 and previous % 10 == 0 and value < limit:
+                joined[-1] = (NUMBER, previous + value)
+                continue
+            return []
+        joined.append((kind, value))
+    return joined
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-case words of ``text`` with punctuation removed."""
+    return _TOKEN_RE.findall(text.lower().replace("ё", "е").replace("_", " "))
+
+
+def route_command(text: str, current_slide: int | None = None) -> dict | None:
+    """Return ``{"name", "args"}`` of the navigation tool for ``text``.
+
+    ``current_slide`` is the 1-based slide shown now; it is needed only for
+    relative jumps like "два слайда вперед". ``None`` is returned whenever
+    the utterance is not an unambiguous navigation command.
+    """
+    words = tokenize(text)
+    if not words or len(words) > MAX_COMMAND_WORDS:
+        return None
+
+    tokens = []
+    for word in words:
+        classified = _classify(word)
+        if classified is None:
+            return None
+        if classified[0] != FILLER:
+            tokens.append(classified)
+
+    tokens = _join_numbers(tokens)
+    kinds = [kind for kind, _ in tokens]
+    if NEXT_WITH_SLIDE in kinds:
+        if SLIDE not in kinds:
+            return None
+        kinds = [NEXT if kind == NEXT_WITH_SLIDE else kind for kind in kinds]
+    numbers = [value for kind, value in tokens if kind == NUMBER]
+    directions = {kind for kind in kinds if kind in (NEXT, PREV)}
+
+    if len(numbers) > 1 or len(directions) > 1 or kinds.count(SLIDE) > 1:
+        return None
+
+    if not numbers:
+        if directions == {NEXT}:
+            return {"name": "next_slide", "args": {}}
+        if directions == {PREV}:
+            return {"name": "previous_slide", "args": {}}
+        return None
+
+    number = numbers[0]
+    if number < 1 or SLIDE not in kinds:
+        return None
+
+    if not directions:
+        return {"name": "open_slide", "args": {"slide_number": number}}
+
+    # "на два слайда вперед" / "три слайда назад"
+    if current_slide is None:
+        return None
+    target = current_slide + number if directions == {NEXT} else current_slide - number
+    if target < 1:
+        return None
+    return {"name": "open_slide", "args": {"slide_number": target}}
+
+
+def _names_slide(text: str) -> bool:
+    for word in tokenize(text):
+        classified = _classify(word)
+        if classified is not None and classified[0] in (SLIDE, NUMBER):
+            return True
+    return False
+
+
+def route_clauses(text: str, current_slide: int | None = None) -> dict | None:
+    """Like :func:`route_command`, but for the command clause of a longer utterance.
+
+    Used when the model is unavailable: in "покажи, пожалуйста, следующий
+    слайд, там про выручку" only "следующий слайд" is a command. Only
+    clauses naming a slide or a number count, so a bare "дальше" in speech
+    does not move the slide. ``None`` is returned when no clause is a
+    command or the clauses ask for different ones.
+    """
+    commands = []
+    for clause in _CLAUSE_RE.split(text):
+        if not _names_slide(clause):
+            continue
+        command = route_command(clause, current_slide)
+        if command is not None and command not in commands:
+            commands.append(command)
+    return commands[0] if len(commands) == 1 else None
+
+
+# Utterances and the tool route_command should pick; checked by ``python router.py``
+_EXAMPLES = [
+    ("следующий слайд", "next_slide"),
+    ("дальше", "next_slide"),
+    ("далее", None),
+    ("следующий слайд далее", "next_slide"),
+    ("слайд далее", "next_slide"),
+    ("и так далее", None),
+    ("ну и так далее", None),
+    ("вот и далее", None),
+    ("назад", "previous_slide"),
+    ("покажи слайд пять", "open_slide"),
+    ("третий слайд", "open_slide"),
+    ("слайд двадцать пятый", "open_slide"),
+    ("слайд пятница", None),
+    ("слайд вторник", None),
+    ("расскажи про выручку", None),
+]
+
+# The same for route_clauses, used when the model is unavailable
+_CLAUSE_EXAMPLES = [
+    ("покажи, пожалуйста, следующий слайд, там про выручку", "next_slide"),
+    ("перейди к слайду 5, спасибо", "open_slide"),
+    ("слайд пятница, коллеги", None),
+    ("в пятницу покажу слайд вторник", None),
+    ("и так далее, коллеги", None),
+    ("дальше, коллеги, посмотрим", None),
+    ("следующий слайд, потом предыдущий слайд", None),
+]
+
+
+if __name__ == "__main__":
+    failed = total = 0
+    for route, examples in ((route_command, _EXAMPLES), (route_clauses, _CLAUSE_EXAMPLES)):
+        for text, expected in examples:
+            command = route(text, current_slide=3)
+            name = command["name"] if command else None
+            total += 1
+            if name != expected:
+                failed += 1
+                print(f"{route.__name__}({text!r}): expected {expected}, got {name}")
+    print(f"{total - failed}/{total} examples routed as expected")
+    raise SystemExit(1 if failed else 0)
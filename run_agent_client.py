@@ -1,12 +1,17 @@
 """Simple CLI client to send text to the running FastAPI agent service."""
 
+import json
+import sys
+
 import requests
 
 BASE_URL = "http://localhost:8000"
 
 
 def main():
-    url = f"{BASE_URL}/run-agent"
+    # With --stream print every message as the service produces it
+    stream = "--stream" in sys.argv[1:]
+    url = f"{BASE_URL}/run-agent/stream" if stream else f"{BASE_URL}/run-agent"
     while True:
         try:
             text = input("Enter text (or 'quit' to exit): ").strip()
@@ -14,8 +19,13 @@ def main():
             break
         if not text or text.lower() in {"quit", "exit"}:
             break
-        resp = requests.post(url, json={"text": text})
+        resp = requests.post(url, json={"text": text}, stream=stream)
         print("Status:", resp.status_code)
+        if stream:
+            for line in resp.iter_lines(decode_unicode=True):
+                if line:
+                    event = json.loads(line)
+                    print(f"[{event['type']}] {event['content']}")
 
 
 if __name__ == "__main__":
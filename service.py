@@ -1,84 +1,244 @@
 """FastAPI service exposing slide-control endpoints and an agent interface."""
 
+import json
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import asyncio
-from tools import next_slide, previous_slide
-from langchain_core.messages import HumanMessage, AIMessage
+import time
+from tools import next_slide, previous_slide, set_slide_context
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from command_queue import MANUAL, viewer_queue
+from config import config
+import metrics
 from graph import graph
-from state import AgentState
+from model import warm_up_in_background
+from nodes import slide_tools
+from plan_cache import plan_cache
+from sessions import DEFAULT_SESSION_ID, Session, SessionStore
+from traces import get_recorder
+from transcripts import TranscriptCoalescer
 
-app = FastAPI()
 
-# In-memory persistent state for the agent
-agent_state: AgentState = {
-    "messages": [],
-    "current_slide": None,
-    "current_presentation": None,
-}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Authenticate and open the model connection before the first command
+    if config.get("model_warmup", True):
+        warm_up_in_background(slide_tools)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+# In-memory agent sessions, one per room
+sessions = SessionStore()
 
 class AgentRequest(BaseModel):
     text: str
+    session_id: str = DEFAULT_SESSION_ID
 
-@app.post("/next-slide")
-async def api_next_slide():
-    def _run():
-        global agent_state
-        result = next_slide.invoke({})
-        if result.get("status") == "ok":
-            agent_state["current_slide"] = result.get("slide_number")
-        return result
+class TranscriptSegment(BaseModel):
+    text: str
+    # partial hypotheses may still change, final segments will not
+    final: bool = False
+    session_id: str = DEFAULT_SESSION_ID
+
+async def _run_slide_tool(session: Session, slide_tool) -> dict:
+    # Manual controls do not wait for the session's agent run: they go
+    # ahead of its tool calls in the viewer queue
+    set_slide_context(session.slides)
+    with metrics.manual_command_seconds.time(command=slide_tool.name):
+        result = await viewer_queue.asubmit(slide_tool.invoke, {}, priority=MANUAL)
+    if result.get("status") == "ok":
+        session.state["current_slide"] = result.get("slide_number")
+    return result
 
-    return await asyncio.to_thread(_run)
+@app.post("/next-slide")
+async def api_next_slide(session_id: str = DEFAULT_SESSION_ID):
+    return await _run_slide_tool(sessions.get(session_id), next_slide)
 
 @app.post("/previous-slide")
-async def api_previous_slide():
-    def _run():
-        global agent_state
-        result = previous_slide.invoke({})
-        if result.get("status") == "ok":
-            agent_state["current_slide"] = result.get("slide_number")
-        return result
-
-    return await asyncio.to_thread(_run)
+async def api_previous_slide(session_id: str = DEFAULT_SESSION_ID):
+    return await _run_slide_tool(sessions.get(session_id), previous_slide)
+
+def _message_event(session: Session, msg) -> dict:
+    """Serialize a graph message for streaming clients."""
+    return {
+        "type": msg.type,
+        "name": msg.name,
+        "content": msg.content,
+        "tool_calls": getattr(msg, "tool_calls", []),
+        "session_id": session.id,
+        "current_slide": session.state.get("current_slide"),
+        "current_presentation": session.state.get("current_presentation"),
+    }
+
+async def _run_agent_steps(session: Session, text: str, on_dispatch=None):
+    """Run the agent on ``text`` and yield each new message as soon as it is produced.
+
+    ``on_dispatch`` is called once tool calls of the run are sent for
+    execution, including calls the run completes after being cancelled.
+    """
+    async with session.lock:
+        # Tools called by the graph act on this session's presentation
+        set_slide_context(session.slides)
+        agent_state = session.state
+        # Add the human message to persistent state
+        human = HumanMessage(content=text)
+        session.memory.add(human)
+        # Last tool call whose results have not arrived yet
+        unanswered = None
+        acted = False
+        start = time.perf_counter()
+        recorder = get_recorder()
+        run_trace = recorder.start_run(session.id, text, agent_state) if recorder else None
+
+        def apply(node: str, node_update: dict | None) -> list:
+            nonlocal acted, unanswered
+            if not node_update:
+                if run_trace is not None:
+                    run_trace.step([], node=node)
+                return []
+            if node_update.get("current_slide") is not None:
+                agent_state["current_slide"] = node_update["current_slide"]
+            if node_update.get("current_presentation") is not None:
+                agent_state["current_presentation"] = node_update["current_presentation"]
+            added = []
+            for msg in node_update.get("messages", []):
+                if isinstance(msg, ToolMessage):
+                    acted, unanswered = True, None
+                elif isinstance(msg, AIMessage) and msg.tool_calls:
+                    unanswered = msg
+                    if on_dispatch is not None:
+                        on_dispatch()
+                if session.memory.add(msg):
+                    added.append(msg)
+            if run_trace is not None:
+                run_trace.step(added, node=node)
+            return added
+
+        # The graph runs in its own task so that a cancelled run can still
+        # collect the results of tools that are already executing
+        updates: asyncio.Queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                # Node updates carry only the messages produced by that node
+                async for update in graph.astream(session.graph_input(), stream_mode="updates"):
+                    updates.put_nowait(update)
+            except Exception as e:
+                updates.put_nowait(e)
+            else:
+                updates.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (update := await updates.get()) is not None:
+                if isinstance(update, Exception):
+                    raise update
+                for node, node_update in update.items():
+                    for msg in apply(node, node_update):
+                        yield msg
+        except asyncio.CancelledError:
+            # Apply updates produced before the cancel, then wait for the
+            # results of dispatched tool calls: tools cannot be stopped, so
+            # the turn is kept and the slide is not moved a second time
+            while unanswered is not None or not updates.empty():
+                update = updates.get_nowait() if not updates.empty() else await updates.get()
+                if update is None or isinstance(update, Exception):
+                    break
+                for node, node_update in update.items():
+                    apply(node, node_update)
+            producer.cancel()
+            # A superseded run leaves no half-finished turn in the history
+            rollback = unanswered if acted else human
+            if rollback is not None:
+                session.memory.truncate(rollback)
+            if session.slides.slide_num is not None:
+                agent_state["current_slide"] = session.slides.slide_num + 1
+            if run_trace is not None:
+                run_trace.end("cancelled")
+            raise
+        except Exception:
+            if run_trace is not None:
+                run_trace.end("error")
+            raise
+        finally:
+            producer.cancel()
+        metrics.agent_run_seconds.observe(time.perf_counter() - start)
+        if run_trace is not None:
+            run_trace.end()
+        session.touch()
 
 @app.post("/run-agent")
 async def run_agent(request: AgentRequest):
-    def _run() -> dict:
-        """Run the agent and print responses as they are produced."""
-        global agent_state
-        # Add the human message to persistent state
-        agent_state["messages"] = agent_state.get("messages", []) + [
-            HumanMessage(content=request.text)
-        ]
-
-        # Stream through the graph so each response is handled immediately
-        stream = graph.stream(agent_state, stream_mode="values")
-
-        for step in stream:
-            msg = step["messages"][-1]
-            try:
-                if msg in agent_state["messages"]:
-                    continue
-
-                if isinstance(msg, AIMessage):
-                    print("Response:", msg.content)
-                else:
-                    msg.pretty_print()
-
-                agent_state["messages"].append(msg)
-                if step.get("current_slide") is not None:
-                    agent_state["current_slide"] = step["current_slide"]
-                if step.get("current_presentation") is not None:
-                    agent_state["current_presentation"] = step["current_presentation"]
-            except AttributeError:
-                print(msg)
-
-        print("Current slide:", agent_state.get("current_slide"))
-        print("Current presentation:", agent_state.get("current_presentation"))
-        return {"status": "ok"}
-
-    return await asyncio.to_thread(_run)
+    """Run the agent and print responses as they are produced."""
+    session = sessions.get(request.session_id)
+    async for msg in _run_agent_steps(session, request.text):
+        _print_message(msg)
+
+    print("Current slide:", session.state.get("current_slide"))
+    print("Current presentation:", session.state.get("current_presentation"))
+    return {"status": "ok", "session_id": session.id}
+
+@app.post("/run-agent/stream")
+async def run_agent_stream(request: AgentRequest):
+    """Stream AI messages and tool results as newline-delimited JSON."""
+    session = sessions.get(request.session_id)
+
+    async def _events():
+        async for msg in _run_agent_steps(session, request.text):
+            yield json.dumps(_message_event(session, msg), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+def _print_message(msg) -> None:
+    if isinstance(msg, AIMessage):
+        print("Response:", msg.content)
+    else:
+        msg.pretty_print()
+
+@app.post("/transcript")
+async def transcript(segment: TranscriptSegment):
+    """Accept a live ASR segment; final segments are coalesced into agent runs."""
+    session = sessions.get(segment.session_id)
+    if session.transcript is None:
+        session.transcript = TranscriptCoalescer(
+            lambda text, on_dispatch: _run_agent_steps(session, text, on_dispatch), on_message=_print_message
+        )
+    session.transcript.feed(segment.text, segment.final)
+    return {
+        "status": "ok",
+        "session_id": session.id,
+        "pending": len(session.transcript.pending),
+        "running": session.transcript.running,
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/queue-stats")
+async def queue_stats():
+    """Depth and wait times of the viewer command queue."""
+    return viewer_queue.stats()
+
+@app.get("/plan-cache-stats")
+async def plan_cache_stats():
+    """Size and hit rate of the cache of model planning decisions."""
+    return plan_cache.stats()
+
+@app.delete("/plan-cache")
+async def clear_plan_cache(presentation: str | None = None):
+    """Forget cached plans of one presentation or of all of them."""
+    return {"status": "ok", "dropped": plan_cache.invalidate(presentation)}
+
+@app.delete("/sessions/{session_id}")
+async def api_drop_session(session_id: str):
+    """Forget a session and close its presentation."""
+    return {"status": "ok" if sessions.drop(session_id) else "not_found"}
 
 
 if __name__ == "__main__":
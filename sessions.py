@@ -0,0 +1,112 @@
+"""In-memory store of agent sessions, one per room or client."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from config import config
+from memory import ConversationMemory
+from state import AgentState
+from tools import SlideContext
+from transcripts import TranscriptCoalescer
+
+MAX_SESSIONS = config.get("max_sessions", 32)
+# Seconds of inactivity after which a session is dropped
+SESSION_TTL = config.get("session_ttl", 4 * 60 * 60)
+
+DEFAULT_SESSION_ID = "default"
+
+
+class Session:
+    """Agent state, opened presentation and execution lane of one session."""
+
+    def __init__(self, session_id: str) -> None:
+        self.id = session_id
+        self.memory = ConversationMemory()
+        # Slide tracking; the message history lives in ``memory``
+        self.state: dict = {
+            "current_slide": None,
+            "current_presentation": None,
+        }
+        self.slides = SlideContext()
+        # Serializes agent runs within the session; viewer commands go through command_queue
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        # Live ASR input, created by the service on the first segment
+        self.transcript: TranscriptCoalescer | None = None
+
+    def graph_input(self) -> AgentState:
+        """State to start a graph run from, with the bounded message history."""
+        return {
+            **self.state,
+            "messages": self.memory.messages(),
+            "summary": self.memory.summary,
+        }
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self.transcript is not None:
+            self.transcript.close()
+        self.slides.close()
+
+
+class SessionStore:
+    """Bounded LRU store of sessions with idle expiration.
+
+    Sessions that are busy (their lock is held) are never evicted, so the
+    store may temporarily exceed ``max_sessions`` under load.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL) -> None:
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str = DEFAULT_SESSION_ID) -> Session:
+        """Return the session ``session_id``, creating it if needed."""
+        with self._lock:
+            evicted = self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id)
+            self._sessions.move_to_end(session_id)
+            session.touch()
+            evicted += self._shrink()
+
+        for old in evicted:
+            old.close()
+        return session
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def _expire(self) -> list[Session]:
+        deadline = time.monotonic() - self.ttl
+        expired = [
+            sid for sid, session in self._sessions.items()
+            if session.last_used < deadline and not session.lock.locked()
+        ]
+        return [self._sessions.pop(sid) for sid in expired]
+
+    def _shrink(self) -> list[Session]:
+        evicted = []
+        for sid in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if not self._sessions[sid].lock.locked():
+                evicted.append(self._sessions.pop(sid))
+        return evicted
@@ -0,0 +1,120 @@
+"""Persistent, content-addressed store for extracted slide texts."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+from config import config
+
+CACHE_DIR = Path(config.get("slide_cache_dir", ".slide_cache"))
+# Bump when the extraction logic changes so stale entries are ignored
+CACHE_VERSION = 2
+
+_CHUNK_SIZE = 1 << 20
+
+# Content hashes of already seen files keyed by (path, size, mtime)
+_hash_memo: dict[tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-1 of a file, memoized by its size and mtime."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        digest = _hash_memo.get(key)
+    if digest is not None:
+        return digest
+
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _hash_lock:
+        _hash_memo[key] = digest
+    return digest
+
+
+class SlideTextCache:
+    """Slide texts of one deck kept in memory and mirrored to disk.
+
+    Entries are keyed by the content hash of the presentation file, so a
+    renamed or copied deck reuses the cache and an edited one gets a new
+    entry. Missing slides are extracted on demand and written back on
+    :meth:`flush`.
+    """
+
+    def __init__(self, path: str, slides_count: int, cache_dir: Path | None = None) -> None:
+        self.digest = file_digest(path)
+        self.file = (cache_dir or CACHE_DIR) / f"{self.digest}.json"
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._texts: list[str | None] = self._load(slides_count)
+
+    def _load(self, slides_count: int) -> list[str | None]:
+        try:
+            with open(self.file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return [None] * slides_count
+
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return [None] * slides_count
+        texts = data.get("texts")
+        if not isinstance(texts, list) or len(texts) != slides_count:
+            return [None] * slides_count
+        return texts
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def is_complete(self) -> bool:
+        return all(text is not None for text in self._texts)
+
+    def peek(self, num: int) -> str | None:
+        """Return the cached text of slide ``num`` without extracting it."""
+        return self._texts[num]
+
+    def get(self, num: int, extract: Callable[[int], str]) -> str:
+        """Return the text of slide ``num``, calling ``extract`` on a miss."""
+        text = self._texts[num]
+        if text is not None:
+            return text
+
+        text = extract(num)
+        with self._lock:
+            if self._texts[num] is None:
+                self._texts[num] = text
+                self._dirty = True
+        return text
+
+    def fill(self, extract: Callable[[int], str]) -> list[str]:
+        """Extract every missing slide and persist the result."""
+        texts = [self.get(i, extract) for i in range(len(self._texts))]
+        self.flush()
+        return texts
+
+    def flush(self) -> None:
+        """Write newly extracted texts to disk atomically."""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {"version": CACHE_VERSION, "texts": list(self._texts)}
+            self._dirty = False
+
+        try:
+            self.file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp, self.file)
+        except OSError:
+            # the cache is an optimization, extraction still works without it
+            with self._lock:
+                self._dirty = True
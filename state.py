@@ -14,3 +14,7 @@ class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     current_slide: int | None
     current_presentation: str | None
+    # Rolling summary of messages dropped from the bounded history
+    summary: str | None
+    # Presentation, slide and model deadline at the start of the current run
+    turn_start: dict | None
@@ -0,0 +1,139 @@
+"""Local, memoized token counting for trimming the conversation.
+
+``trim_messages`` recounts every message of the history on each reflect step.
+:class:`TokenCounter` estimates tokens locally without any request to the
+model provider and remembers the count of every message it has seen.
+Run ``python token_counter.py`` to compare the estimate with the GigaChat
+tokenizer.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Sequence
+
+from langchain_core.messages import BaseMessage
+
+from config import config
+
+# Average characters per token of a word; tune with the accuracy report
+CHARS_PER_TOKEN = config.get("token_chars_per_token", 4.0)
+# Tokens spent on role markers and separators of each message
+MESSAGE_OVERHEAD = 4
+MAX_CACHED_MESSAGES = 4096
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    text = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps(
+            [{"name": call["name"], "args": call["args"]} for call in tool_calls],
+            ensure_ascii=False,
+        )
+    if message.name:
+        text += message.name
+    return text
+
+
+class TokenCounter:
+    """Callable ``token_counter`` for ``trim_messages`` with a per-message cache.
+
+    Counts are keyed by message ID and a hash of the message text, so an
+    edited message is recounted while unchanged history costs a dict lookup.
+    """
+
+    def __init__(self, chars_per_token: float = CHARS_PER_TOKEN, max_entries: int = MAX_CACHED_MESSAGES) -> None:
+        self.chars_per_token = chars_per_token
+        self.max_entries = max_entries
+        self._cache: OrderedDict[tuple, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count_text(self, text: str) -> int:
+        tokens = 0
+        for match in _WORD_RE.finditer(text):
+            tokens += math.ceil(len(match.group()) / self.chars_per_token)
+        return tokens
+
+    def count_message(self, message: BaseMessage) -> int:
+        text = _message_text(message)
+        key = (message.type, message.id, hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest())
+        with self._lock:
+            count = self._cache.get(key)
+            if count is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return count
+
+        count = self.count_text(text) + MESSAGE_OVERHEAD
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = count
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return count
+
+    def __call__(self, messages: Iterable[BaseMessage]) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+
+count_tokens = TokenCounter()
+
+
+def get_token_counter(model):
+    """Return the ``token_counter`` configured for ``trim_messages``."""
+    if config.get("token_counter", "local") == "model":
+        return model
+    return count_tokens
+
+
+def measure_accuracy(model, texts: Sequence[str], counter: TokenCounter = count_tokens) -> dict:
+    """Compare local estimates for ``texts`` with the GigaChat tokenizer."""
+    remote = [item.tokens for item in model.tokens_count(list(texts))]
+    local = [counter.count_text(text) for text in texts]
+    errors = [(est - ref) / ref for est, ref in zip(local, remote) if ref]
+    return {
+        "samples": len(errors),
+        "local_tokens": sum(local),
+        "remote_tokens": sum(remote),
+        "mean_abs_error": sum(abs(e) for e in errors) / len(errors) if errors else 0.0,
+        "bias": sum(errors) / len(errors) if errors else 0.0,
+        "suggested_chars_per_token": (
+            counter.chars_per_token * sum(local) / sum(remote) if sum(remote) else counter.chars_per_token
+        ),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    from model import get_base_model
+    from prompts import create_system_prompt
+
+    # Texts to compare: given files or the system prompt with sample commands
+    if len(sys.argv) > 1:
+        samples = []
+        for path in sys.argv[1:]:
+            with open(path, "r", encoding="utf-8") as f:
+                samples.extend(line.strip() for line in f if line.strip())
+    else:
+        samples = [
+            create_system_prompt(),
+            "Следующий слайд, пожалуйста",
+            "Покажи слайд про выручку за третий квартал",
+            "Open the presentation about quarterly results",
+            '{"status": "ok", "slide_number": 5, "text": "Выводы и дальнейшие шаги"}',
+        ]
+
+    for key, value in measure_accuracy(get_base_model(), samples).items():
+        print(f"{key}: {value}")
@@ -0,0 +1,126 @@
+"""Grouping of the tool calls of one model message into ordered batches.
+
+``ToolNode`` runs all calls of a message at once, so "три слайда вперед"
+answered with three ``next_slide`` calls pays the viewer's key delays three
+times, and a ``list_slides_tool`` next to ``open_presentation_tool`` may read
+the deck that is about to be closed. ``use_tool_node`` instead executes the
+batches of :func:`plan_batches` one after another:
+
+- the calls of one batch run concurrently;
+- ``open_presentation_tool`` starts a new batch whenever the deck it replaces
+  is still used by calls before or after it;
+- the navigation calls of a batch are replaced by one ``open_slide`` to their
+  net target, and every original call gets the result it would have had.
+  The target is computed by :func:`jump` on the viewer queue worker, so a
+  manual command that runs first is taken into account.
+"""
+
+from __future__ import annotations
+
+import json
+
+from langchain_core.messages import ToolMessage
+
+import tools
+from metrics import Counter
+
+NAVIGATION_TOOLS = {tools.open_slide.name, tools.next_slide.name, tools.previous_slide.name}
+# Calls that replace the open deck
+BARRIER_TOOLS = {tools.open_presentation_tool.name}
+# Calls that do not depend on the open deck
+DECK_INDEPENDENT_TOOLS = {tools.list_presentations_tool.name}
+
+tool_calls_coalesced = Counter(
+    "tool_calls_coalesced_total", "Navigation tool calls merged into a single open_slide"
+)
+
+
+class ToolBatch:
+    def __init__(self) -> None:
+        # calls executed as they are, concurrently
+        self.calls: list[dict] = []
+        # navigation calls in their original order
+        self.navigation: list[dict] = []
+        self.opens_deck = False
+
+    def uses_deck(self) -> bool:
+        return bool(self.navigation) or any(
+            call["name"] not in DECK_INDEPENDENT_TOOLS | BARRIER_TOOLS for call in self.calls
+        )
+
+
+def plan_batches(tool_calls: list[dict]) -> list[ToolBatch]:
+    batches = [ToolBatch()]
+    for call in tool_calls:
+        current = batches[-1]
+        if call["name"] in DECK_INDEPENDENT_TOOLS:
+            batches[0].calls.append(call)
+        elif call["name"] in BARRIER_TOOLS:
+            if current.opens_deck or current.uses_deck():
+                current = ToolBatch()
+                batches.append(current)
+            current.calls.append(call)
+            current.opens_deck = True
+        else:
+            if current.opens_deck:
+                current = ToolBatch()
+                batches.append(current)
+            if call["name"] in NAVIGATION_TOOLS:
+                current.navigation.append(call)
+            else:
+                current.calls.append(call)
+    return batches
+
+
+def navigation_targets(calls: list[dict], slide: int | None, count: int) -> list[int] | None:
+    """1-based slide shown after each of ``calls``, or ``None`` when a step leaves the deck."""
+    targets = []
+    for call in calls:
+        if call["name"] == tools.open_slide.name:
+            slide = call["args"].get("slide_number")
+            if not isinstance(slide, int):
+                return None
+        elif slide is None:
+            return None
+        else:
+            slide += 1 if call["name"] == tools.next_slide.name else -1
+        if not 1 <= slide <= count:
+            return None
+        targets.append(slide)
+    return targets
+
+
+def jump(calls: list[dict]) -> tuple[list[int], dict] | None:
+    """Apply ``calls`` as one ``open_slide``; submit it to the viewer queue.
+
+    Returns the slide after each call and the result of the jump, or
+    ``None`` without touching the viewer when a step leaves the deck.
+    """
+    ctx = tools.get_slide_context()
+    prs = ctx.presentation
+    if prs is None:
+        return None
+    slide = ctx.slide_num + 1 if ctx.slide_num is not None else None
+    targets = navigation_targets(calls, slide, prs.slides_count())
+    if targets is None:
+        return None
+    # already on the queue worker, so the tool runs inline
+    return targets, tools.open_slide.invoke({"slide_number": targets[-1]})
+
+
+def expand_result(calls: list[dict], targets: list[int], result: dict) -> list[ToolMessage]:
+    """Per-call results of coalesced ``calls`` from the ``result`` of the single jump."""
+    tool_calls_coalesced.inc(len(calls))
+    ok = result.get("status") == "ok"
+    prs = tools.get_slide_context().presentation
+
+    messages = []
+    for i, (call, target) in enumerate(zip(calls, targets)):
+        if not ok or i == len(calls) - 1:
+            content = result
+        else:
+            content = {"status": "ok", "slide_number": target, "text": prs.get_slide_text(target - 1)}
+        messages.append(ToolMessage(
+            content=json.dumps(content, ensure_ascii=False), name=call["name"], tool_call_id=call["id"],
+        ))
+    return messages
@@ -1,25 +1,94 @@
 """LangChain tools for listing presentations and controlling slides."""
 
 from langchain_core.tools import tool
+from contextvars import ContextVar, Token
 from typing import Annotated
+import json
 import os
 import platform
 from presentation import create_presentation, BasePresentation
+from rag import SlideSearchSource
+from command_queue import viewer_command
+from prefetch import prefetcher
+from metrics import timed_tool
+from token_counter import count_tokens
 import time
 
 from config import config
 
 PRESENTATIONS_DIR = config.get("presentations_dir", "presentations")
 OS_TYPE = config.get("os", platform.system().lower())
-
-_current_presentation: BasePresentation | None = None
-_current_presentation_path: str | None = None
-_current_slide_num: int | None = None
+# Bounds on the size of list_slides_tool output
+LIST_SLIDES_LIMIT = config.get("list_slides_limit", 10)
+LIST_SLIDES_MAX_LIMIT = config.get("list_slides_max_limit", 20)
+SLIDE_TEXT_CHARS = config.get("slide_text_chars", 300)
+SLIDE_TITLE_CHARS = 80
+# Token budget of one list_slides_tool result; together with the system prompt
+# it must fit into the 1000 tokens the conversation is trimmed to
+LIST_SLIDES_MAX_TOKENS = config.get("list_slides_max_tokens", 400)
+SEARCH_MAX_RESULTS = config.get("search_max_results", 5)
 
 from viewer import get_viewer
 
 
+class SlideContext:
+    """Presentation opened by the tools and the slide currently shown."""
+
+    def __init__(self) -> None:
+        self.presentation: BasePresentation | None = None
+        self.presentation_path: str | None = None
+        # 0-based index of the current slide
+        self.slide_num: int | None = None
+        self._search: SlideSearchSource | None = None
+
+    @property
+    def search(self) -> SlideSearchSource:
+        """Search over the open presentation, built on first use."""
+        if self._search is None:
+            self._search = SlideSearchSource(self.presentation.get_all_slide_texts())
+        return self._search
+
+    def close(self) -> None:
+        if self.presentation is not None:
+            try:
+                self.presentation.close()
+            except Exception:
+                pass
+        self.presentation = None
+        self.presentation_path = None
+        self.slide_num = None
+        self._search = None
+
+
+# Tools act on the context of the current session; the CLI uses the default one
+_default_context = SlideContext()
+_slide_context: ContextVar[SlideContext] = ContextVar("slide_context", default=_default_context)
+
+
+def get_slide_context() -> SlideContext:
+    return _slide_context.get()
+
+
+def set_slide_context(context: SlideContext) -> Token:
+    """Make tools in the current task/thread context act on ``context``."""
+    return _slide_context.set(context)
+
+
+def slide_title(text: str) -> str:
+    """First non-empty line of a slide text; extraction puts the title first."""
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip()
+    return ""
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
 @tool
+@timed_tool
 def list_presentations_tool() -> dict:
     """Получить список файлов презентаций в каталоге."""
     if not os.path.isdir(PRESENTATIONS_DIR):
@@ -36,53 +105,52 @@ def list_presentations_tool() -> dict:
 
 
 @tool
+@timed_tool
+@viewer_command
 def open_presentation_tool(presentation_name: Annotated[str, "Имя файла презентации с расширением, например 'презентация 2.pdf'"]) -> dict:
     """Открыть презентацию для просмотра"""
-    global _current_presentation, _current_presentation_path, _current_slide_num
-    
+    ctx = get_slide_context()
+
     presentation_path = os.path.join(PRESENTATIONS_DIR, presentation_name)
 
     if not os.path.exists(presentation_path):
         return {"status": "error", "message": f"Файл {presentation_name} не найден"}
 
-    if _current_presentation is not None:
-        try:
-            _current_presentation.close()
-        except Exception:
-            pass
-        _current_presentation = None
-        _current_presentation_path = None
-        _current_slide_num = None
+    ctx.close()
 
     try:
         viewer = get_viewer(OS_TYPE, presentation_path)
         prs = create_presentation(presentation_path, viewer)
         prs.open()
-        time.sleep(2)
+        time.sleep(viewer.open_delay)
         prs.start_show()
     except Exception as e:  # pragma: no cover - basic error reporting
         return {"status": "error", "message": f"Не удалось открыть файл: {e}"}
 
-    _current_presentation = prs
-    _current_presentation_path = presentation_path
-    _current_slide_num = 0
-    return {
+    ctx.presentation = prs
+    ctx.presentation_path = presentation_path
+    ctx.slide_num = 0
+    result = {
         "status": "ok",
         "slides_count": prs.slides_count(),
         "presentation_name": presentation_name,
         "message": f"Открыта презентация {presentation_name}",
     }
+    prefetcher.schedule(ctx)
+    return result
 
 
 @tool
+@timed_tool
+@viewer_command
 def open_slide(slide_number: Annotated[int, "номер слайда"]) -> dict:
     """Открыть необходимый слайд в презентации по его номеру"""
-    global _current_presentation, _current_slide_num
+    ctx = get_slide_context()
 
-    if _current_presentation is None:
+    if ctx.presentation is None:
         return {"status": "error", "message": "Презентация не открыта"}
 
-    prs = _current_presentation
+    prs = ctx.presentation
 
     if slide_number < 1 or slide_number > prs.slides_count():
         return {"status": "error", "message": "Некорректный номер слайда"}
@@ -92,22 +160,25 @@ def open_slide(slide_number: Annotated[int, "номер слайда"]) -> dict:
     except Exception:
         pass
 
-    _current_slide_num = slide_number - 1
+    ctx.slide_num = slide_number - 1
     text = prs.get_slide_text(slide_number - 1)
+    prefetcher.schedule(ctx)
 
     return {"status": "ok", "slide_number": slide_number, "text": text}
 
 
 @tool
+@timed_tool
+@viewer_command
 def next_slide() -> dict:
     """Перейти к следующему слайду текущей презентации."""
-    global _current_presentation, _current_slide_num
+    ctx = get_slide_context()
 
-    if _current_presentation is None or _current_slide_num is None:
+    if ctx.presentation is None or ctx.slide_num is None:
         return {"status": "error", "message": "Презентация не открыта"}
 
-    prs = _current_presentation
-    if _current_slide_num + 1 >= prs.slides_count():
+    prs = ctx.presentation
+    if ctx.slide_num + 1 >= prs.slides_count():
         return {"status": "error", "message": "Некорректный номер слайда"}
 
     try:
@@ -115,26 +186,29 @@ def next_slide() -> dict:
     except Exception:
         pass
 
-    _current_slide_num += 1
-    text = prs.get_slide_text(_current_slide_num)
+    ctx.slide_num += 1
+    text = prs.get_slide_text(ctx.slide_num)
+    prefetcher.schedule(ctx)
 
     return {
         "status": "ok",
-        "slide_number": _current_slide_num + 1,
+        "slide_number": ctx.slide_num + 1,
         "text": text,
     }
 
 
 @tool
+@timed_tool
+@viewer_command
 def previous_slide() -> dict:
     """Перейти к предыдущему слайду текущей презентации."""
-    global _current_presentation, _current_slide_num
+    ctx = get_slide_context()
 
-    if _current_presentation is None or _current_slide_num is None:
+    if ctx.presentation is None or ctx.slide_num is None:
         return {"status": "error", "message": "Презентация не открыта"}
 
-    prs = _current_presentation
-    if _current_slide_num <= 0:
+    prs = ctx.presentation
+    if ctx.slide_num <= 0:
         return {"status": "error", "message": "Некорректный номер слайда"}
 
     try:
@@ -142,27 +216,73 @@ def previous_slide() -> dict:
     except Exception:
         pass
 
-    _current_slide_num -= 1
-    text = prs.get_slide_text(_current_slide_num)
+    ctx.slide_num -= 1
+    text = prs.get_slide_text(ctx.slide_num)
+    prefetcher.schedule(ctx)
 
     return {
         "status": "ok",
-        "slide_number": _current_slide_num + 1,
+        "slide_number": ctx.slide_num + 1,
         "text": text,
     }
 
 
 @tool
-def list_slides_tool() -> dict:
-    """Получить номера слайдов и соответствующее им текстовое содержимое"""
-    global _current_presentation
-
-    if _current_presentation is None:
+@timed_tool
+def list_slides_tool(
+    offset: Annotated[int, "Сколько первых слайдов пропустить"] = 0,
+    limit: Annotated[int, "Сколько слайдов вернуть"] = LIST_SLIDES_LIMIT,
+    titles_only: Annotated[bool, "Вернуть только заголовки слайдов"] = False,
+) -> dict:
+    """Получить номера слайдов и их текстовое содержимое постранично. Текст каждого слайда сокращён, заголовок идёт первым; для обзора всей презентации используйте titles_only. Если next_offset не пуст, остальные слайды можно получить, передав его в offset."""
+    ctx = get_slide_context()
+
+    if ctx.presentation is None:
         return {"status": "error", "message": "Презентация не открыта"}
 
-    prs = _current_presentation
+    prs = ctx.presentation
+    count = prs.slides_count()
+    offset = max(0, offset)
+    limit = min(max(1, limit), LIST_SLIDES_MAX_LIMIT)
 
     slides = []
-    for i in range(prs.slides_count()):
-        slides.append({"number": i + 1, "text": prs.get_slide_text(i)})
-    return {"status": "ok", "slides": slides}
+    tokens = 0
+    end = offset
+    for i in range(offset, min(count, offset + limit)):
+        text = prs.get_slide_text(i)
+        if titles_only:
+            slide = {"number": i + 1, "title": _truncate(slide_title(text), SLIDE_TITLE_CHARS)}
+        else:
+            slide = {"number": i + 1, "text": _truncate(text, SLIDE_TEXT_CHARS)}
+        tokens += count_tokens.count_text(json.dumps(slide, ensure_ascii=False))
+        # the rest is left for the next page
+        if slides and tokens > LIST_SLIDES_MAX_TOKENS:
+            break
+        slides.append(slide)
+        end = i + 1
+    prs.text_cache.flush()
+
+    return {
+        "status": "ok",
+        "slides_count": count,
+        "slides": slides,
+        "next_offset": end if end < count else None,
+    }
+
+
+@tool
+@timed_tool
+def search_slides_tool(
+    query: Annotated[str, "Слова, которые должны быть на слайде, например 'выручка за квартал'"],
+    top_k: Annotated[int, "Сколько слайдов вернуть"] = 3,
+) -> dict:
+    """Найти слайды текущей презентации по содержимому. Возвращает номера наиболее подходящих слайдов и короткие фрагменты их текста."""
+    ctx = get_slide_context()
+
+    if ctx.presentation is None:
+        return {"status": "error", "message": "Презентация не открыта"}
+
+    results = ctx.search.search(query, top_k=min(max(1, top_k), SEARCH_MAX_RESULTS))
+    if not results:
+        return {"status": "ok", "results": [], "message": "Подходящие слайды не найдены"}
+    return {"status": "ok", "results": results}
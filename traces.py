@@ -0,0 +1,142 @@
+"""Compact JSONL traces of agent runs for offline replay.
+
+Enabled by setting ``trace_dir`` in ``config.yaml``; every process then
+appends to ``<trace_dir>/<start time>-<pid>.jsonl``. A run is written as one
+``run`` record (input text and slide state), one ``step`` record per graph
+node with the messages it produced and its duration, and an ``end`` record.
+``replay.py`` feeds such traces back through the graph.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from config import config
+from nodes import ROUTER_NAME
+
+TRACE_DIR = config.get("trace_dir")
+
+
+def message_record(msg: BaseMessage) -> dict:
+    """The parts of a message needed to replay it."""
+    record = {"type": msg.type, "content": msg.content}
+    if msg.name:
+        record["name"] = msg.name
+    if isinstance(msg, AIMessage) and msg.tool_calls:
+        record["tool_calls"] = [
+            {"name": call["name"], "args": call["args"], "id": call["id"]} for call in msg.tool_calls
+        ]
+    if isinstance(msg, ToolMessage):
+        record["tool_call_id"] = msg.tool_call_id
+    return record
+
+
+def message_from_record(record: dict) -> BaseMessage:
+    kwargs = {"content": record["content"], "name": record.get("name")}
+    if record["type"] == "ai":
+        return AIMessage(tool_calls=record.get("tool_calls", []), **kwargs)
+    if record["type"] == "tool":
+        return ToolMessage(tool_call_id=record["tool_call_id"], **kwargs)
+    return HumanMessage(**kwargs)
+
+
+def _node_of(msg: BaseMessage) -> str:
+    # for streams that do not name the node, e.g. stream_mode="values"
+    if isinstance(msg, ToolMessage):
+        return "use_tool"
+    return "route" if msg.name == ROUTER_NAME else "reflect"
+
+
+class RunTrace:
+    """Records of one graph run; steps are timed from the previous step."""
+
+    def __init__(self, recorder: "TraceRecorder", session_id: str, text: str, state: dict) -> None:
+        self.recorder = recorder
+        self.id = uuid.uuid4().hex[:12]
+        self._start = self._last = time.perf_counter()
+        recorder.write({
+            "type": "run",
+            "run": self.id,
+            "session": session_id,
+            "time": time.time(),
+            "text": text,
+            "state": {key: state.get(key) for key in ("current_slide", "current_presentation")},
+        })
+
+    def step(self, messages: list[BaseMessage], node: str | None = None) -> None:
+        now = time.perf_counter()
+        if messages:
+            self.recorder.write({
+                "type": "step",
+                "run": self.id,
+                "node": node or _node_of(messages[-1]),
+                "elapsed_ms": round((now - self._last) * 1000, 3),
+                "messages": [message_record(msg) for msg in messages],
+            })
+        self._last = now
+
+    def end(self, status: str = "ok") -> None:
+        self.recorder.write({
+            "type": "end",
+            "run": self.id,
+            "status": status,
+            "elapsed_ms": round((time.perf_counter() - self._start) * 1000, 3),
+        })
+
+
+class TraceRecorder:
+    """Append-only JSONL trace file shared by all sessions of the process."""
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def start_run(self, session_id: str, text: str, state: dict) -> RunTrace:
+        return RunTrace(self, session_id, text, state)
+
+
+_recorder: TraceRecorder | None = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> TraceRecorder | None:
+    """The process-wide recorder, or ``None`` when tracing is disabled."""
+    global _recorder
+    if not TRACE_DIR:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl"
+            _recorder = TraceRecorder(Path(TRACE_DIR) / name)
+        return _recorder
+
+
+def load_runs(path: str | os.PathLike) -> list[dict]:
+    """Read a trace back as runs: ``{"run": ..., "steps": [...], "end": ...}``."""
+    runs: dict[str, dict] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["type"] == "run":
+                runs[record["run"]] = {**record, "steps": [], "end": None}
+            elif record["run"] in runs:
+                if record["type"] == "step":
+                    runs[record["run"]]["steps"].append(record)
+                else:
+                    runs[record["run"]]["end"] = record
+    return list(runs.values())
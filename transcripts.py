@@ -0,0 +1,126 @@
+"""Coalescing of live ASR transcript segments into agent runs."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from typing import AsyncIterator, Callable
+
+from langchain_core.messages import BaseMessage
+
+from config import config
+
+# Seconds of silence after a final segment before the agent is run
+DEBOUNCE = config.get("transcript_debounce", 0.4)
+
+
+class TranscriptCoalescer:
+    """Turns the ASR segments of one session into as few agent runs as possible.
+
+    Partial hypotheses never start a run, they only postpone a scheduled one
+    while the speaker is still talking. Final segments are collected and run
+    together once the speaker pauses for ``debounce`` seconds. A final
+    segment that arrives while a run is in flight cancels it; if the run had
+    not dispatched any tool call by the time it finished, its text is run
+    again with the new segment. Dispatched calls are completed by the
+    cancelled run.
+
+    ``steps(text, on_dispatch)`` runs the agent and calls ``on_dispatch``
+    when it sends tool calls for execution.
+    """
+
+    def __init__(
+        self,
+        steps: Callable[[str, Callable[[], None]], AsyncIterator[BaseMessage]],
+        on_message: Callable[[BaseMessage], None] | None = None,
+        debounce: float = DEBOUNCE,
+    ) -> None:
+        self._steps = steps
+        self._on_message = on_message
+        self.debounce = debounce
+        self.partial = ""
+        self.pending: list[str] = []
+        self._timer: asyncio.Task | None = None
+        self._run: asyncio.Task | None = None
+        self._run_text = ""
+        # whether the current run dispatched tool calls
+        self._acted = {"acted": False}
+        # cancelled runs with their text and dispatch flag, oldest first
+        self._superseded: list[tuple[asyncio.Task, str, dict]] = []
+        # texts of superseded runs already put back at the head of pending
+        self._restored = 0
+        self.stats = {"segments": 0, "runs": 0, "cancelled": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._run is not None and not self._run.done()
+
+    def feed(self, text: str, final: bool) -> None:
+        """Accept one transcript segment; must be called from the event loop."""
+        self.stats["segments"] += 1
+        if not final:
+            self.partial = text
+            if self.pending:
+                self._schedule()
+            return
+
+        self.partial = ""
+        if text.strip():
+            self.pending.append(text.strip())
+        if not self.pending:
+            return
+        self._supersede()
+        self._schedule()
+
+    def _supersede(self) -> None:
+        if not self.running:
+            return
+        self._run.cancel()
+        self.stats["cancelled"] += 1
+        self._superseded.append((self._run, self._run_text, self._acted))
+        self._run = None
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.create_task(self._wait_and_run())
+
+    async def _restore_superseded(self) -> None:
+        # a cancelled run may still finish tool calls it dispatched, so its
+        # outcome is known only once it has ended
+        while self._superseded:
+            run, text, acted = self._superseded[0]
+            await asyncio.wait({run})
+            self._superseded.pop(0)
+            # nothing was sent to the screen, so the old words still need handling
+            if not acted["acted"]:
+                self.pending.insert(self._restored, text)
+                self._restored += 1
+
+    async def _wait_and_run(self) -> None:
+        await asyncio.sleep(self.debounce)
+        await self._restore_superseded()
+        self._timer = None
+        text = " ".join(self.pending)
+        self.pending.clear()
+        self._restored = 0
+        self._run_text = text
+        self._acted = acted = {"acted": False}
+        self.stats["runs"] += 1
+        self._run = asyncio.create_task(self._execute(text, lambda: acted.update(acted=True)))
+
+    async def _execute(self, text: str, on_dispatch: Callable[[], None]) -> None:
+        try:
+            async for msg in self._steps(text, on_dispatch):
+                if self._on_message is not None:
+                    self._on_message(msg)
+        except Exception as e:  # nobody awaits the run, report instead of losing the error
+            print(f"Transcript run failed: {e}", file=sys.stderr)
+
+    def close(self) -> None:
+        for task in (self._timer, self._run, *(run for run, _, _ in self._superseded)):
+            if task is not None:
+                task.cancel()
+        self._timer = self._run = None
+        self._superseded.clear()
+        self.pending.clear()
@@ -1,66 +1,151 @@
 """OS-specific helpers to open presentations and navigate slides via automation."""
 
 import subprocess
+import threading
 import time
-import pyautogui
+from concurrent.futures import Future
+
+from command_queue import MANUAL, viewer_queue
+from config import config
+from metrics import viewer_key_wait_seconds
+
+# Minimum pause between two key presses, in seconds
+KEY_DELAY = config.get("viewer_key_delay", 0.15)
+# Relative moves closer together than this are merged into one jump
+COALESCE_WINDOW = config.get("viewer_coalesce_window", 0.3)
+# Jump by typing the slide number + Enter instead of pressing arrows
+DIRECT_JUMP = config.get("viewer_direct_jump", True)
+
 
 class PresentationViewer:
     """Base class for platform specific presentation viewers."""
 
-    def __init__(self) -> None:
+    direct_jump = DIRECT_JUMP
+    # Seconds to let the viewer window appear before starting the show
+    open_delay = 2
+
+    def __init__(self, key_delay: float = KEY_DELAY, coalesce_window: float = COALESCE_WINDOW) -> None:
         self.process: subprocess.Popen | None = None
         self.current_num: int | None = None
         self.path: str | None = None
+        self.key_delay = key_delay
+        self.coalesce_window = coalesce_window
+        # Slide actually displayed; lags behind current_num while moves are coalesced
+        self._shown_num: int | None = None
+        self._last_key_time = 0.0
+        self._last_move_time = 0.0
+        self._pending_flush: Future | None = None
+        self._lock = threading.RLock()
 
     def open(self, path: str):
         raise NotImplementedError
 
     def close(self):
-        if self.process and self.process.poll() is None:
-            self.process.terminate()
-        self.process = None
-        self.current_num = None
+        with self._lock:
+            self._cancel_flush()
+            if self.process and self.process.poll() is None:
+                self.process.terminate()
+            self.process = None
+            self.current_num = None
+            self._shown_num = None
+
+    def _wait_key_delay(self) -> None:
+        # Sleep only for what is left of the delay since the previous key
+        remaining = self.key_delay - (time.monotonic() - self._last_key_time)
+        if remaining > 0:
+            time.sleep(remaining)
+            viewer_key_wait_seconds.observe(remaining)
+
+    def _require_pyautogui(self):
+        # Imported on the first key press: it needs a desktop session and is slow to load
+        try:
+            import pyautogui
+        except Exception as e:  # pragma: no cover - optional dependency, needs a desktop
+            raise RuntimeError("pyautogui library is not available") from e
+        return pyautogui
 
     def _press_key(self, key: str) -> None:
+        pyautogui = self._require_pyautogui()
+        self._wait_key_delay()
         pyautogui.press(key)
+        self._last_key_time = time.monotonic()
         print(key)
 
     def _press_hotkey(self, *args) -> None:
+        pyautogui = self._require_pyautogui()
+        self._wait_key_delay()
         pyautogui.hotkey(args)
+        self._last_key_time = time.monotonic()
         print("+".join(args))
 
-    def goto_slide(self, num: int) -> None:
-        """Navigate to a slide using left/right arrows."""
-        if self.process is None:
-            return
+    def _jump(self, num: int) -> None:
+        """Jump straight to a slide by typing its number followed by Enter."""
+        for s in str(num):
+            self._press_key(s)
+        self._press_key("enter")
 
-        start = self.current_num or 1
-        steps = num - start
+    def _show(self, num: int) -> None:
+        """Bring the viewer from the displayed slide to ``num``."""
+        steps = num - (self._shown_num or 1)
         if steps == 0:
             return
 
-        key = "right" if steps > 0 else "left"
-        for _ in range(abs(steps)):
-            time.sleep(1)
-            self._press_key(key)
-        self.current_num = num
+        if self.direct_jump and abs(steps) > 1:
+            self._jump(num)
+        else:
+            key = "right" if steps > 0 else "left"
+            for _ in range(abs(steps)):
+                self._press_key(key)
+        self._shown_num = num
+
+    def _cancel_flush(self) -> None:
+        if self._pending_flush is not None:
+            self._pending_flush.cancel()
+            self._pending_flush = None
+
+    def flush(self) -> None:
+        """Apply relative moves that are still being coalesced."""
+        with self._lock:
+            self._cancel_flush()
+            if self.process is not None and self.current_num:
+                self._show(self.current_num)
+
+    def _move_by(self, delta: int) -> None:
+        with self._lock:
+            if self.process is None:
+                return
+            self.current_num = max(1, (self.current_num or 1) + delta)
+
+            # The first move is shown at once; moves following it in quick
+            # succession are merged and shown together once they stop
+            now = time.monotonic()
+            burst = self._pending_flush is not None or now - self._last_move_time < self.coalesce_window
+            self._last_move_time = now
+            if not burst or self.coalesce_window <= 0:
+                self._show(self.current_num)
+                return
+
+            # Shown by the viewer queue worker like any other command; a
+            # command that runs before it takes the pending moves over
+            self._cancel_flush()
+            self._pending_flush = viewer_queue.submit_later(self.coalesce_window, self.flush, priority=MANUAL)
+
+    def goto_slide(self, num: int) -> None:
+        """Navigate to a slide, jumping directly when it is not adjacent."""
+        with self._lock:
+            if self.process is None:
+                return
+            self._cancel_flush()
+            self.current_num = num
+            self._show(num)
 
     def next_slide(self) -> None:
         """Move to the next slide."""
-        if self.process is None:
-            return
-        time.sleep(1)
-        self._press_key("right")
-        self.current_num = (self.current_num or 1) + 1
+        self._move_by(1)
 
     def previous_slide(self) -> None:
         """Move to the previous slide."""
-        if self.process is None:
-            return
-        time.sleep(1)
-        self._press_key("left")
-        current = self.current_num or 1
-        self.current_num = max(1, current - 1)
+        self._move_by(-1)
 
     def start_show(self):
         """Optional: start presentation in fullscreen."""
@@ -81,16 +166,6 @@ class LinuxPresentationViewer(PresentationViewer):
         self.current_num = 0
         self.path = path
 
-    def goto_slide(self, num: int) -> None:
-        """Navigate by typing slide number followed by Enter."""
-        if self.process is None:
-            return
-
-        for s in str(num):
-            self._press_key(s)
-        self._press_key("enter")
-        self.current_num = num
-
 
 class WindowsPresentationViewer(PresentationViewer):
     """Basic viewer for Windows using start command."""
@@ -133,23 +208,63 @@ class MacPdfPresentationViewer(MacPresentationViewer):
         self._press_key("return")
         self._press_hotkey("fn", "f")
         time.sleep(1)
-        self.current_index = 0
-
-
-    def goto_slide(self, num: int) -> None:
-        """Navigate to a slide using left/right arrows."""
+        self.current_num = 0
 
+    def _jump(self, num: int) -> None:
+        """Use the "Go to Page" dialog of Preview."""
         self._press_hotkey("option", "command", "g")
 
         for s in str(num):
             self._press_key(s)
 
         self._press_key("return")
-        self.current_num = num
+
+
+class _HeadlessProcess:
+    """Stand-in for the viewer process of :class:`HeadlessPresentationViewer`."""
+
+    def poll(self):
+        return None
+
+    def terminate(self):
+        pass
+
+
+class HeadlessPresentationViewer(PresentationViewer):
+    """Viewer without a desktop that records key events instead of sending them.
+
+    Used for tests and benchmarks; select it with ``os: headless`` in
+    ``config.yaml``. ``events`` holds ``(monotonic time, key)`` pairs.
+    """
+
+    open_delay = 0
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.events: list[tuple[float, str]] = []
+
+    def open(self, path: str):
+        self.close()
+        self.process = _HeadlessProcess()
+        self.current_num = 0
+        self.path = path
+
+    def _record(self, key: str) -> None:
+        self._wait_key_delay()
+        self._last_key_time = time.monotonic()
+        self.events.append((self._last_key_time, key))
+
+    def _press_key(self, key: str) -> None:
+        self._record(key)
+
+    def _press_hotkey(self, *args) -> None:
+        self._record("+".join(args))
 
 
 def get_viewer(os_type: str, path: str | None = None) -> PresentationViewer:
     """Return viewer instance depending on OS and file type."""
+    if os_type == "headless":
+        return HeadlessPresentationViewer()
     if os_type.startswith("win"):
         return WindowsPresentationViewer()
     if os_type == "mac":